@@ -0,0 +1,142 @@
+"""Выделение alias для новых ссылок без предварительного SELECT
+
+Две стратегии:
+- RandomAllocator: случайные alias генерируются пачками, коллизию ловит
+  уникальный индекс при вставке, вызывающий код повторяет попытку;
+- CounterAllocator: счетчик в БД выдает блоки номеров, номер переставляется
+  секретной перестановкой (сеть Фейстеля) и кодируется в base62, поэтому
+  alias не повторяются и не угадываются по соседним ссылкам.
+"""
+
+import asyncio
+import hashlib
+import secrets
+import string
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+ALPHABET = string.digits + string.ascii_letters
+
+# Состояние счетчика живет в своей таблице, отдельно от моделей приложений
+metadata = MetaData()
+alias_counters = Table(
+    "alias_counters",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("value", Integer, nullable=False),
+    Column("secret", String, nullable=False),
+)
+
+
+def encode_base62(number: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        number, digit = divmod(number, 62)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class RandomAllocator:
+    """Случайные alias, генерируемые пачкой из одного вызова urandom"""
+
+    # Байты >= 248 отбрасываем, чтобы b % 62 было равномерным
+    _ACCEPT = 62 * 4
+    _REJECT = bytes(range(_ACCEPT, 256))
+    _TABLE = bytes(ALPHABET[b % 62].encode()[0] for b in range(256))
+
+    def __init__(self, length=8):
+        self.length = length
+
+    async def allocate(self, count: int):
+        need = count * self.length
+        chars = b""
+        while len(chars) < need:
+            raw = secrets.token_bytes(need - len(chars) + need // 8 + 8)
+            chars += raw.translate(self._TABLE, self._REJECT)
+        text = chars[:need].decode()
+        starts = range(0, need, self.length)
+        stops = range(self.length, need + 1, self.length)
+        return [text[start:stop] for start, stop in zip(starts, stops)]
+
+
+class CounterAllocator:
+    """Alias из блоков счетчика, переставленных ключевой сетью Фейстеля"""
+
+    ROUNDS = 4
+
+    def __init__(self, engine, length=8, block_size=1000, name="urls"):
+        self.engine = engine
+        self.length = length
+        self.block_size = block_size
+        self.name = name
+        self.space = 62**length
+        # Сеть работает на 2 * half_bits бит, лишние значения отбрасываем
+        self.half_bits = (self.space.bit_length() + 1) // 2
+        self._mask = (1 << self.half_bits) - 1
+        self._key = None
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    def _reserve_block(self):
+        """Атомарно забирает следующий блок номеров: (начало, конец, ключ)"""
+        metadata.create_all(self.engine, checkfirst=True)
+        while True:
+            with self.engine.begin() as conn:
+                row = conn.execute(
+                    update(alias_counters)
+                    .where(alias_counters.c.name == self.name)
+                    .values(value=alias_counters.c.value + self.block_size)
+                    .returning(alias_counters.c.value, alias_counters.c.secret)
+                ).first()
+            if row is not None:
+                end, secret = row
+                return end - self.block_size, end, bytes.fromhex(secret)
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        insert(alias_counters).values(
+                            name=self.name, value=0, secret=secrets.token_hex(32)
+                        )
+                    )
+            except IntegrityError:
+                # Строку счетчика одновременно создал другой процесс
+                pass
+
+    def _round(self, half: int, round_no: int) -> int:
+        digest = hashlib.blake2b(
+            half.to_bytes(8, "big") + bytes([round_no]), key=self._key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") & self._mask
+
+    def permute(self, number: int) -> int:
+        """Биекция на [0, 62**length): Фейстель с обходом цикла"""
+        while True:
+            left, right = number >> self.half_bits, number & self._mask
+            for round_no in range(self.ROUNDS):
+                left, right = right, left ^ self._round(right, round_no)
+            number = (left << self.half_bits) | right
+            if number < self.space:
+                return number
+
+    async def allocate(self, count: int):
+        async with self._lock:
+            numbers = []
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    start, end, key = await run_in_threadpool(self._reserve_block)
+                    self._next, self._end, self._key = start, end, key
+                take = min(count - len(numbers), self._end - self._next)
+                numbers.extend(range(self._next, self._next + take))
+                self._next += take
+        return [encode_base62(self.permute(n), self.length) for n in numbers]
+
+
+def make_allocator(strategy: str, engine, length=8, block_size=1000):
+    if strategy == "counter":
+        return CounterAllocator(engine, length=length, block_size=block_size)
+    if strategy == "random":
+        return RandomAllocator(length=length)
+    raise ValueError(f"Unknown alias strategy: {strategy}")
@@ -0,0 +1,59 @@
+import hashlib
+import os
+from collections import namedtuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.database import get_async_db
+
+# Проверенный пользователь: обработчикам нужен только id и имя
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "username"])
+
+# Ключ дайджеста живет только в памяти процесса, пароли в кэше не хранятся
+_DIGEST_KEY = os.urandom(32)
+
+
+def credentials_digest(username: str, password: str) -> str:
+    raw = f"{username}:{password}".encode()
+    return hashlib.blake2b(raw, key=_DIGEST_KEY, digest_size=32).hexdigest()
+
+
+class CredentialCache(TTLCache):
+    """Кэш проверенных учетных данных: дайджест username:password -> пользователь"""
+
+    def invalidate_user(self, username: str):
+        return self.invalidate_matching(lambda user: user.username == username)
+
+
+def current_user_dependency(authenticate, cache: CredentialCache):
+    """Общая зависимость FastAPI, возвращающая проверенного пользователя
+
+    authenticate(db, username, password) - проверка по БД, вызывается
+    только при промахе кэша.
+    """
+    security = HTTPBasic()
+
+    async def get_current_user(
+        credentials: HTTPBasicCredentials = Depends(security),
+        db: AsyncSession = Depends(get_async_db),
+    ) -> AuthenticatedUser:
+        key = credentials_digest(credentials.username, credentials.password)
+        user = cache.get(key)
+        if user is not None:
+            return user
+
+        db_user = await authenticate(db, credentials.username, credentials.password)
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid credentials",
+                headers={"WWW-Authenticate": "Basic"},
+            )
+        user = AuthenticatedUser(db_user.id, db_user.username)
+        cache.set(key, user)
+        return user
+
+    return get_current_user
@@ -0,0 +1,121 @@
+"""Фильтр Блума по существующим alias: заведомо неизвестный alias получает
+404 без обращения к БД (сканеры /wp-login.php, /.env, случайные строки)
+
+Ложных отказов нет: alias, добавленный в фильтр, всегда проходит. Ложные
+срабатывания (доля error_rate) просто идут в БД, как и раньше. Удаление из
+фильтра невозможно, поэтому он периодически пересобирается заново.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        # Оптимальные число бит и число хешей для capacity элементов
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.items = 0
+
+    def _positions(self, key):
+        # Двойное хеширование: k позиций из двух 64-битных половин blake2b
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class AliasFilter:
+    """Фильтр Блума с пересборкой и счетчиками для метрик
+
+    До первой сборки (rebuild) пропускает все alias. Alias, добавленные во
+    время пересборки, попадают и в новый фильтр.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = None
+        self._added_during_rebuild = None
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.checked = 0
+        self.rejected = 0
+        self.rebuilds = 0
+
+    def might_contain(self, alias):
+        bloom = self._filter
+        if bloom is None:
+            return True
+        self.checked += 1
+        if alias in bloom:
+            return True
+        self.rejected += 1
+        return False
+
+    def add(self, alias):
+        self.update([alias])
+
+    def update(self, aliases):
+        with self._lock:
+            for alias in aliases:
+                if self._filter is not None:
+                    self._filter.add(alias)
+                if self._added_during_rebuild is not None:
+                    self._added_during_rebuild.append(alias)
+
+    def rebuild(self, aliases, count):
+        """Собирает фильтр заново из итератора aliases (count - их число)
+
+        Емкость - не меньше capacity и вдвое больше текущего числа alias,
+        чтобы до следующей пересборки доля ложных срабатываний не росла.
+        """
+        with self._lock:
+            self._added_during_rebuild = []
+        try:
+            bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+            for alias in aliases:
+                bloom.add(alias)
+            with self._lock:
+                for alias in self._added_during_rebuild:
+                    bloom.add(alias)
+                self._filter = bloom
+        finally:
+            with self._lock:
+                self._added_during_rebuild = None
+        self.built_at = time.monotonic()
+        self.rebuilds += 1
+        return bloom.items
+
+    def age(self):
+        """Секунд с последней сборки, None - фильтр еще не собран"""
+        if self.built_at is None:
+            return None
+        return time.monotonic() - self.built_at
+
+    def stats(self):
+        bloom = self._filter
+        return {
+            "items": bloom.items if bloom else 0,
+            "bytes": len(bloom.bits) if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "rebuilds": self.rebuilds,
+        }
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Что кэшируем для alias: всего, что нужно редиректу, без похода в БД
+CachedURL = namedtuple(
+    "CachedURL", ["url_id", "original_url", "is_active", "expires_at"]
+)
+
+
+class TTLCache:
+    """Ограниченный LRU-кэш с временем жизни записей и счетчиками"""
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, stored_at = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Как get, но без счетчиков и без продвижения в LRU"""
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or time.monotonic() - item[1] > self.ttl:
+            return None
+        return item[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_matching(self, predicate):
+        """Удаляет все записи, значение которых удовлетворяет predicate"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,195 @@
+"""Приемники кликов для ClickBuffer (app/clicks.py)
+
+Приемник - объект с name, write(batch) и close(). write получает список
+Click и либо записывает его целиком, либо бросает исключение, тогда пачка
+будет отдана повторно (доставка "хотя бы один раз").
+
+- FunctionSink - функция записи пачки, например INSERT в url_clicks;
+- NdjsonSegmentSink, ParquetSegmentSink - append-only файлы-сегменты;
+- BrokerSink - публикация в LocalBroker, локальную замену брокера
+  сообщений (Kafka и т.п.) для разработки и бенчмарков.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from app.clicks import Click
+from app.export import ndjson_chunk
+
+
+class FunctionSink:
+    def __init__(self, name, write):
+        self.name = name
+        self._write = write
+
+    def write(self, batch):
+        self._write(batch)
+
+    def close(self):
+        pass
+
+
+class SegmentSink:
+    """Клики пишутся в сегмент <directory>/clicks-<время>-<pid>-<n><suffix>
+
+    Пока сегмент открыт, файл называется с окончанием .part; после
+    max_rows строк или max_seconds с открытия (проверяется при записи) и
+    при остановке он закрывается и переименовывается - готовые сегменты
+    можно забирать без оглядки на писателя.
+    """
+
+    name = "segments"
+    suffix = ""
+
+    def __init__(self, directory, max_rows=100_000, max_seconds=300.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.segments = 0
+        self._path = None
+        self._opened = None
+        self._rows = 0
+
+    def write(self, batch):
+        if self._path is None:
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+            name = f"clicks-{stamp}-{os.getpid()}-{self.segments}{self.suffix}"
+            self._path = os.path.join(self.directory, name)
+            self._opened = time.monotonic()
+            self._open(self._path + ".part")
+        self._append(batch)
+        self._rows += len(batch)
+        if (
+            self._rows >= self.max_rows
+            or time.monotonic() - self._opened >= self.max_seconds
+        ):
+            self.close()
+
+    def close(self):
+        if self._path is None:
+            return
+        self._finish(self._path + ".part")
+        os.replace(self._path + ".part", self._path)
+        self._path = None
+        self._rows = 0
+        self.segments += 1
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _append(self, batch):
+        raise NotImplementedError
+
+    def _finish(self, path):
+        raise NotImplementedError
+
+
+class NdjsonSegmentSink(SegmentSink):
+    name = "ndjson"
+    suffix = ".ndjson"
+
+    def _open(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _append(self, batch):
+        self._file.write(ndjson_chunk(Click._fields, batch))
+        self._file.flush()
+
+    def _finish(self, path):
+        self._file.close()
+
+
+class ParquetSegmentSink(SegmentSink):
+    """Сегменты Parquet (нужен pyarrow: pip install -e ".[parquet]")
+
+    Колонки сегмента копятся в памяти и пишутся в файл при закрытии.
+    """
+
+    name = "parquet"
+    suffix = ".parquet"
+
+    def __init__(self, directory, max_rows=100_000, max_seconds=300.0):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise RuntimeError(
+                'Parquet click sink requires pyarrow: pip install -e ".[parquet]"'
+            ) from error
+        self._pyarrow = pyarrow
+        super().__init__(directory, max_rows, max_seconds)
+
+    def _open(self, path):
+        self._columns = {field: [] for field in Click._fields}
+
+    def _append(self, batch):
+        for field, values in zip(Click._fields, zip(*batch)):
+            self._columns[field].extend(values)
+
+    def _finish(self, path):
+        table = self._pyarrow.table(self._columns)
+        self._pyarrow.parquet.write_table(table, path)
+        self._columns = None
+
+
+class LocalBroker:
+    """Брокер сообщений в памяти процесса: темы с номерами сообщений (offset)
+
+    В теме хранятся последние retention сообщений; потребитель сам помнит
+    свой offset и читает с него через consume.
+    """
+
+    def __init__(self, retention=100_000):
+        self.retention = retention
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def publish(self, topic, messages):
+        with self._lock:
+            log = self._topics.get(topic)
+            if log is None:
+                log = self._topics[topic] = [0, deque(maxlen=self.retention)]
+            for message in messages:
+                log[1].append((log[0], message))
+                log[0] += 1
+
+    def consume(self, topic, offset=0, limit=1000):
+        """([(offset, сообщение)], следующий offset); вытесненные пропускаются"""
+        with self._lock:
+            log = self._topics.get(topic)
+            if log is None:
+                return [], offset
+            next_offset, messages = log
+            first = next_offset - len(messages)
+            start = max(offset, first) - first
+            batch = list(islice(messages, start, start + limit))
+        if not batch:
+            return [], max(offset, first)
+        return batch, batch[-1][0] + 1
+
+    def end_offset(self, topic):
+        with self._lock:
+            log = self._topics.get(topic)
+            return log[0] if log else 0
+
+
+class BrokerSink:
+    """Клик -> сообщение NDJSON-строкой (как его отправил бы продюсер)"""
+
+    name = "broker"
+
+    def __init__(self, broker, topic="clicks"):
+        self.broker = broker
+        self.topic = topic
+
+    def write(self, batch):
+        # split("\n"), а не splitlines(): в User-Agent бывают \u2028 и т.п.
+        lines = ndjson_chunk(Click._fields, batch).rstrip("\n").split("\n")
+        self.broker.publish(self.topic, [line.encode() for line in lines])
+
+    def close(self):
+        pass
@@ -0,0 +1,317 @@
+"""Колоночное хранилище сырых кликов: месяцы истории на одном узле
+
+Приемник кликов "columnar" (см. app/click_sinks.py). Вместо строк
+url_clicks клики лежат в неизменяемых сегментах, разложенных по суточным
+партициям: <directory>/<ГГГГММДД>/<время>-<pid>-<n>.clk. Колонки сегмента:
+- ts - миллисекунды от начала суток (array "I", отсортированы);
+- url_id - array "I";
+- ua - номер User-Agent в словаре сегмента (array "I"), сам словарь -
+  строки через \\0;
+- ip - 16 байт на клик (IPv4 как ::ffff:a.b.c.d, нули - адрес неизвестен).
+Каждая колонка сжата zlib. Клик занимает порядка 10 байт вместо сотни в
+url_clicks с индексами.
+
+Окно по времени - bisect по ts внутри сегмента, подсчет по ссылкам -
+Counter по срезу колонки url_id (цикл на C). Пока сегмент открыт, его
+клики видны запросам этого процесса, другим воркерам - после закрытия
+(CLICK_SEGMENT_MAX_ROWS строк или CLICK_SEGMENT_MAX_SECONDS секунд).
+"""
+
+import ipaddress
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from app.clicks import Click
+
+MAGIC = b"CLK1"
+# magic, строк, начало суток (секунды Unix), строк в словаре UA
+HEADER = struct.Struct("<4sIqI")
+BLOB_SIZE = struct.Struct("<I")
+NO_IP = bytes(16)
+_IPV4_PREFIX = bytes(10) + b"\xff\xff"
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+PARTITION_FORMAT = "%Y%m%d"
+
+# Сегмент целиком: колонки уже распакованы
+Segment = namedtuple("Segment", ["start", "ts", "url_id", "ua", "ip", "user_agents"])
+
+
+def pack_ip(value):
+    if not value:
+        return NO_IP
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return NO_IP
+    if address.version == 4:
+        return _IPV4_PREFIX + address.packed
+    return address.packed
+
+
+def unpack_ip(packed):
+    if packed == NO_IP:
+        return None
+    address = ipaddress.IPv6Address(packed)
+    return str(address.ipv4_mapped or address)
+
+
+def _ip_at(column, row):
+    start = row * 16
+    end = start + 16
+    return bytes(column[start:end])
+
+
+def _little_endian(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _blob(data):
+    data = zlib.compress(data)
+    return BLOB_SIZE.pack(len(data)) + data
+
+
+def _read_blob(file):
+    (size,) = BLOB_SIZE.unpack(file.read(BLOB_SIZE.size))
+    return zlib.decompress(file.read(size))
+
+
+def _column(typecode, data):
+    column = array(typecode)
+    column.frombytes(data)
+    return _little_endian(column)
+
+
+class _OpenSegment:
+    """Клики одних суток, еще не записанные на диск"""
+
+    def __init__(self, start):
+        self.start = start
+        self.opened = time.monotonic()
+        self.ts = array("I")
+        self.url_id = array("I")
+        self.ua = array("I")
+        self.ip = bytearray()
+        self.user_agents = {}
+
+    def append(self, click):
+        user_agent = click.user_agent or ""
+        ua_id = self.user_agents.get(user_agent)
+        if ua_id is None:
+            ua_id = self.user_agents[user_agent] = len(self.user_agents)
+        self.ts.append((click.clicked_at - self.start) // MILLISECOND)
+        self.url_id.append(click.url_id)
+        self.ua.append(ua_id)
+        self.ip += pack_ip(click.ip_address)
+
+    def encode(self):
+        """Байты сегмента; строки упорядочены по времени"""
+        order = sorted(range(len(self.ts)), key=self.ts.__getitem__)
+        ts = array("I", (self.ts[row] for row in order))
+        url_id = array("I", (self.url_id[row] for row in order))
+        ua = array("I", (self.ua[row] for row in order))
+        ip = b"".join(_ip_at(self.ip, row) for row in order)
+        user_agents = "\0".join(self.user_agents).encode("utf-8", "surrogateescape")
+        start = int((self.start - EPOCH).total_seconds())
+        return b"".join(
+            [
+                HEADER.pack(MAGIC, len(ts), start, len(self.user_agents)),
+                _blob(_little_endian(ts).tobytes()),
+                _blob(_little_endian(url_id).tobytes()),
+                _blob(_little_endian(ua).tobytes()),
+                _blob(ip),
+                _blob(user_agents),
+            ]
+        )
+
+
+def read_segment(path, full=True):
+    """Segment из файла; full=False - только ts и url_id (для окон)"""
+    with open(path, "rb") as file:
+        magic, rows, start, _ = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a click segment")
+        start = EPOCH + timedelta(seconds=start)
+        ts = _column("I", _read_blob(file))
+        url_id = _column("I", _read_blob(file))
+        if not full:
+            return Segment(start, ts, url_id, None, None, None)
+        ua = _column("I", _read_blob(file))
+        ip = _read_blob(file)
+        user_agents = _read_blob(file).decode("utf-8", "surrogateescape").split("\0")
+    return Segment(start, ts, url_id, ua, ip, user_agents)
+
+
+# Сегменты неизменяемы: колонки для окон держим для недавно прочитанных
+@lru_cache(maxsize=256)
+def _window_columns(path):
+    return read_segment(path, full=False)
+
+
+class ColumnarClickStore:
+    """Приемник кликов и запросы по окнам времени поверх сегментов"""
+
+    name = "columnar"
+
+    def __init__(self, directory, max_rows=100_000, max_seconds=300.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self._open = {}
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.segments = 0
+        self.bytes = 0
+
+    def write(self, batch):
+        with self._lock:
+            for click in batch:
+                start = datetime.combine(click.clicked_at.date(), datetime.min.time())
+                segment = self._open.get(start)
+                if segment is None:
+                    segment = self._open[start] = _OpenSegment(start)
+                segment.append(click)
+            now = time.monotonic()
+            for start, segment in list(self._open.items()):
+                if (
+                    len(segment.ts) >= self.max_rows
+                    or now - segment.opened >= self.max_seconds
+                ):
+                    self._close_segment(start)
+
+    def close(self):
+        with self._lock:
+            for start in list(self._open):
+                self._close_segment(start)
+
+    def _close_segment(self, start):
+        segment = self._open[start]
+        partition = os.path.join(self.directory, start.strftime(PARTITION_FORMAT))
+        os.makedirs(partition, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        path = os.path.join(partition, f"{stamp}-{os.getpid()}-{self.segments}.clk")
+        data = segment.encode()
+        with open(path + ".part", "wb") as file:
+            file.write(data)
+        os.replace(path + ".part", path)
+        del self._open[start]
+        self.rows += len(segment.ts)
+        self.segments += 1
+        self.bytes += len(data)
+
+    def _segment_paths(self, since, until):
+        """Закрытые сегменты партиций с since (None - с первой) по until"""
+        first = since.strftime(PARTITION_FORMAT) if since else ""
+        last = until.strftime(PARTITION_FORMAT)
+        for day in sorted(os.listdir(self.directory)):
+            if len(day) != 8 or not day.isdigit() or not first <= day <= last:
+                continue
+            partition = os.path.join(self.directory, day)
+            for name in sorted(os.listdir(partition)):
+                if name.endswith(".clk"):
+                    yield os.path.join(partition, name)
+
+    def window_counts(self, since, until=None, url_ids=None):
+        """Counter url_id -> клики в [since, until), until по умолчанию - сейчас"""
+        until = until or datetime.utcnow()
+        counts = Counter()
+        for path in self._segment_paths(since, until):
+            segment = _window_columns(path)
+            low = bisect_left(segment.ts, (since - segment.start) // MILLISECOND)
+            high = bisect_left(segment.ts, (until - segment.start) // MILLISECOND)
+            counts.update(segment.url_id[low:high])
+        with self._lock:
+            for segment in self._open.values():
+                low = (since - segment.start) // MILLISECOND
+                high = (until - segment.start) // MILLISECOND
+                counts.update(
+                    url_id
+                    for ts, url_id in zip(segment.ts, segment.url_id)
+                    if low <= ts < high
+                )
+        if url_ids is not None:
+            url_ids = set(url_ids)
+            counts = Counter({key: n for key, n in counts.items() if key in url_ids})
+        return counts
+
+    def clicks(self, since=None, until=None, url_ids=None):
+        """Клики окна в виде Click по партициям, внутри сегмента - по времени
+
+        since=None - с первой партиции. Открытые сегменты этого процесса
+        идут последними, url_ids - только клики этих ссылок.
+        """
+        until = until or datetime.utcnow()
+        url_ids = None if url_ids is None else set(url_ids)
+        for path in self._segment_paths(since, until):
+            yield from self._segment_clicks(read_segment(path), since, until, url_ids)
+        with self._lock:
+            opened = [
+                self._snapshot(segment)
+                for start, segment in sorted(self._open.items())
+                if since is None or start + timedelta(days=1) > since
+            ]
+        for segment in opened:
+            yield from self._segment_clicks(segment, since, until, url_ids)
+
+    @staticmethod
+    def _snapshot(segment):
+        """Segment из открытого сегмента: копия строк в порядке времени"""
+        order = sorted(range(len(segment.ts)), key=segment.ts.__getitem__)
+        return Segment(
+            segment.start,
+            array("I", (segment.ts[row] for row in order)),
+            array("I", (segment.url_id[row] for row in order)),
+            array("I", (segment.ua[row] for row in order)),
+            b"".join(_ip_at(segment.ip, row) for row in order),
+            list(segment.user_agents),
+        )
+
+    @staticmethod
+    def _segment_clicks(segment, since, until, url_ids):
+        low = 0
+        if since is not None:
+            low = bisect_left(segment.ts, (since - segment.start) // MILLISECOND)
+        high = bisect_left(segment.ts, (until - segment.start) // MILLISECOND)
+        for row in range(low, high):
+            if url_ids is not None and segment.url_id[row] not in url_ids:
+                continue
+            yield Click(
+                segment.url_id[row],
+                segment.start + segment.ts[row] * MILLISECOND,
+                unpack_ip(_ip_at(segment.ip, row)),
+                segment.user_agents[segment.ua[row]] or None,
+            )
+
+    def prune(self, before):
+        """Удаляет партиции целиком старше суток before, возвращает их число"""
+        cutoff = before.strftime(PARTITION_FORMAT)
+        removed = 0
+        for name in sorted(os.listdir(self.directory)):
+            if len(name) == 8 and name.isdigit() and name < cutoff:
+                shutil.rmtree(os.path.join(self.directory, name))
+                removed += 1
+        if removed:
+            _window_columns.cache_clear()
+        return removed
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "segments": self.segments,
+            "bytes": self.bytes,
+            "open_rows": sum(len(segment.ts) for segment in self._open.values()),
+        }
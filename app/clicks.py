@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Один клик по ссылке в том виде, в каком он лежит в очереди
+Click = namedtuple("Click", ["url_id", "clicked_at", "ip_address", "user_agent"])
+
+# Что делать с новым кликом, когда очередь заполнена
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest")
+
+
+class ClickBuffer:
+    """Ограниченная очередь кликов между редиректом и аналитикой
+
+    Редирект только кладет клик в очередь (без ожидания БД и диска).
+    Фоновый поток забирает клики пачками - по размеру пачки или по таймеру -
+    и отдает каждую пачку всем приемникам (app/click_sinks.py). Ошибка
+    одного приемника не задерживает остальные: его пачки копятся отдельно
+    (не больше max_pending) и повторяются на следующем сбросе.
+
+    Очередь заполнена - клик теряется по политике overflow (drop_new -
+    новый, drop_oldest - самый старый) и учитывается в dropped.
+    """
+
+    def __init__(
+        self,
+        sinks,
+        max_size=500,
+        interval=1.0,
+        max_pending=None,
+        overflow="drop_new",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        self.sinks = list(sinks)
+        self.max_size = max_size
+        self.interval = interval
+        self.max_pending = max_pending or max_size * 100
+        self.overflow = overflow
+        self._pending = deque(maxlen=self.max_pending)
+        self._retry = {sink.name: [] for sink in self.sinks}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.errors = 0
+        self.sink_stats = {
+            sink.name: {"written": 0, "errors": 0, "dropped": 0} for sink in self.sinks
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="click-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает фоновый поток, сбрасывает остаток и закрывает приемники"""
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                logger.exception("Не удалось закрыть приемник кликов %s", sink.name)
+
+    def add(self, url_id, clicked_at, ip_address=None, user_agent=None):
+        """Ставит клик в очередь; False - очередь полна и клик потерян"""
+        if self._thread is None:
+            self.start()
+        click = Click(url_id, clicked_at, ip_address, user_agent)
+        with self._lock:
+            size = len(self._pending)
+            if size >= self.max_pending:
+                self.dropped += 1
+                if self.overflow == "drop_new":
+                    return False
+            # drop_oldest: deque(maxlen) сам вытесняет самый старый клик
+            self._pending.append(click)
+            size = len(self._pending)
+            if size > self.high_water:
+                self.high_water = size
+        if size >= self.max_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Отдает накопленные клики приемникам, возвращает их количество"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            for sink in self.sinks:
+                self._deliver(sink, batch)
+            if batch:
+                self.flushed += len(batch)
+                self.batches += 1
+            return len(batch)
+
+    def _deliver(self, sink, batch):
+        stats = self.sink_stats[sink.name]
+        retry = self._retry[sink.name]
+        pending = retry + batch if retry else batch
+        if not pending:
+            return
+        try:
+            sink.write(pending)
+        except Exception:
+            logger.exception("Приемник %s не принял %d кликов", sink.name, len(pending))
+            self.errors += 1
+            stats["errors"] += 1
+            # Повтор на следующем сбросе, но не больше max_pending кликов
+            excess = len(pending) - self.max_pending
+            if excess > 0:
+                stats["dropped"] += excess
+                pending = pending[excess:]
+            self._retry[sink.name] = pending
+            return
+        self._retry[sink.name] = []
+        stats["written"] += len(pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def stats(self):
+        stats = {
+            "pending": len(self._pending),
+            "capacity": self.max_pending,
+            "high_water": self.high_water,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+        for name, sink_stats in self.sink_stats.items():
+            stats[f"{name}_retrying"] = len(self._retry[name])
+            for key, value in sink_stats.items():
+                stats[f"{name}_{key}"] = value
+        return stats
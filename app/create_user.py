@@ -1,27 +1,30 @@
 import asyncio
 
-from .database import AsyncSessionLocal, Base, engine
-from .models import User
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.database import async_session_scope, dispose_engines
+from app.simple_app import User, ensure_schema, password_hasher
 
 
 async def create_default_user():
-    # Создаем таблицы
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Схема та же, что при запуске app.simple_app
+    await run_in_threadpool(ensure_schema)
 
-    async with AsyncSessionLocal() as db:
+    async with async_session_scope() as db:
         # Проверяем, существует ли пользователь
-        from sqlalchemy import select
-
-        result = await db.execute(select(User).filter(User.username == "admin"))
+        result = await db.execute(select(User).where(User.username == "admin"))
         existing_user = result.scalar_one_or_none()
 
         if existing_user:
             print(f"Пользователь {existing_user.username} уже существует")
             return
 
-        # Создаем тестового пользователя
-        user = User(username="admin", hashed_password="password")
+        # Создаем тестового пользователя (scrypt в пуле хеширования)
+        user = User(
+            username="admin",
+            hashed_password=await password_hasher.hash("password"),
+        )
 
         db.add(user)
         await db.commit()
@@ -30,5 +33,14 @@ async def create_default_user():
         print("Пароль: password")
 
 
+async def main():
+    try:
+        await create_default_user()
+    finally:
+        password_hasher.shutdown()
+        # Без этого потоки aiosqlite не дают процессу завершиться
+        await dispose_engines()
+
+
 if __name__ == "__main__":
-    asyncio.run(create_default_user())
+    asyncio.run(main())
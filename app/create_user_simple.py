@@ -4,6 +4,9 @@ from sqlalchemy import Boolean, Column, DateTime, Integer, String, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.config import settings
+from app.passwords import hash_password
+
 # SQLite база данных
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
@@ -41,8 +44,11 @@ def create_default_user():
 
     # Создаем тестового пользователя
     user = User(
-        username="admin", hashed_password="password"
-    )  # В реальном приложении используйте хеширование!
+        username="admin",
+        hashed_password=hash_password(
+            "password", settings.SCRYPT_N, settings.SCRYPT_R, settings.SCRYPT_P
+        ),
+    )
 
     db.add(user)
     db.commit()
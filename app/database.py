@@ -1,14 +1,142 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}  # важно для SQLite
+
+def sqlite_pragmas(profile=None):
+    """PRAGMA, выполняемые на каждом новом соединении, для профиля SQLite"""
+    profile = profile or settings.SQLITE_PROFILE
+    if profile == "default":
+        return []
+    if profile != "tuned":
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    return [
+        # До создания таблиц, иначе на новой базе режим уже не сменить
+        ("auto_vacuum", settings.SQLITE_AUTO_VACUUM),
+        ("journal_mode", settings.SQLITE_JOURNAL_MODE),
+        ("synchronous", settings.SQLITE_SYNCHRONOUS),
+        ("mmap_size", settings.SQLITE_MMAP_SIZE),
+        ("cache_size", settings.SQLITE_CACHE_SIZE),
+        ("busy_timeout", settings.SQLITE_BUSY_TIMEOUT),
+        ("temp_store", "MEMORY"),
+    ]
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Выполнять PRAGMA при открытии каждого DBAPI-соединения пула"""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def pool_options(url, poolclass=QueuePool):
+    """Пул соединений процесса; базы в памяти используют свой пул
+
+    Для файловой SQLite через aiosqlite SQLAlchemy по умолчанию берет
+    NullPool (новое соединение и PRAGMA на каждую сессию), поэтому класс
+    пула задается явно.
+    """
+    if url.startswith("sqlite") and (":memory:" in url or url.endswith("://")):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def make_engine(url):
+    """Синхронный движок: SQLite (файл или память) или PostgreSQL"""
+    options = pool_options(url)
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}  # важно для SQLite
+    else:
+        # Соединения, закрытые сервером (рестарт, failover реплики)
+        options["pool_pre_ping"] = True
+    new_engine = create_engine(url, **options)
+    apply_sqlite_pragmas(new_engine, sqlite_pragmas())
+    return new_engine
+
+
+def make_async_engine(url):
+    options = pool_options(url, AsyncAdaptedQueuePool)
+    if not url.startswith("sqlite"):
+        options["pool_pre_ping"] = True
+    new_engine = create_async_engine(url, **options)
+    apply_sqlite_pragmas(new_engine.sync_engine, sqlite_pragmas())
+    return new_engine
+
+
+def async_database_url(url):
+    """Асинхронный вариант URL: sqlite:// -> sqlite+aiosqlite://,
+    postgresql:// -> postgresql+asyncpg://"""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+
+# Запись всегда идет в основную базу; чтение для редиректов и статистики -
+# в реплику, если задан DATABASE_REPLICA_URL, иначе тоже в основную
+engine = make_engine(settings.DATABASE_URL)
+read_engine = (
+    make_engine(settings.DATABASE_REPLICA_URL)
+    if settings.DATABASE_REPLICA_URL
+    else engine
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+# Асинхронные движки (aiosqlite / asyncpg) для обработчиков async def
+ASYNC_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+ASYNC_REPLICA_URL = settings.ASYNC_DATABASE_REPLICA_URL or async_database_url(
+    settings.DATABASE_REPLICA_URL
+)
+async_engine = make_async_engine(ASYNC_URL)
+async_read_engine = (
+    make_async_engine(ASYNC_REPLICA_URL) if ASYNC_REPLICA_URL else async_engine
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+def dialect_insert(table):
+    """INSERT с ON CONFLICT для диалекта основной базы (SQLite или PostgreSQL)"""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def dispose_engines():
+    """Закрыть соединения пулов (потоки aiosqlite не дают процессу завершиться)"""
+    for async_pool in {async_engine, async_read_engine}:
+        await async_pool.dispose()
+    for sync_pool in {engine, read_engine}:
+        sync_pool.dispose()
+
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +144,101 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class ThreadedSession:
+    """Синхронная сессия с интерфейсом AsyncSession
+
+    Каждый вызов к БД выполняется в пуле потоков Starlette, поэтому
+    обработчики async def работают и без aiosqlite (ASYNC_DB=false).
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+@asynccontextmanager
+async def async_session_scope(read_only=False):
+    """Сессия для async-кода: AsyncSession или ThreadedSession по ASYNC_DB
+
+    read_only=True - сессия на реплике (если она настроена); данные в ней
+    могут отставать от основной базы на задержку репликации.
+    """
+    if settings.ASYNC_DB:
+        factory = AsyncReadSessionLocal if read_only else AsyncSessionLocal
+        async with factory() as db:
+            yield db
+    else:
+        factory = ReadSessionLocal if read_only else SessionLocal
+        db = ThreadedSession(factory(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def stream_partitions(db, statement, size):
+    """Строки запроса пачками по size через серверный курсор (yield_per)
+
+    Для AsyncSession - db.stream(), для ThreadedSession каждая следующая
+    пачка читается в пуле потоков.
+    """
+    statement = statement.execution_options(yield_per=size)
+    if isinstance(db, ThreadedSession):
+        result = await db.execute(statement)
+        partitions = result.partitions()
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+    else:
+        result = await db.stream(statement)
+        async for rows in result.partitions():
+            yield rows
+
+
+async def get_async_db():
+    async with async_session_scope() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with async_session_scope(read_only=True) as db:
+        yield db
@@ -0,0 +1,50 @@
+"""Потоковая выгрузка результатов запроса в NDJSON или CSV
+
+Строки приходят пачками (partitions серверного курсора), каждая пачка
+сразу превращается в один кусок ответа: память не зависит от размера
+выгрузки.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+# Формат выгрузки -> media type ответа
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunk(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, map(_value, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+async def export_chunks(partitions, columns, fmt):
+    """Куски ответа из асинхронного итератора пачек строк"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for rows in partitions:
+            writer.writerows([_value(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Пустая выгрузка: только заголовок
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        async for rows in partitions:
+            yield ndjson_chunk(columns, rows)
+
+
+def export_headers(filename, fmt):
+    return {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
@@ -0,0 +1,101 @@
+from urllib.parse import quote
+
+# Статусы, которыми можно отвечать на редирект
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Тело 404 то же, что у HTTPException(404) в redirect_url
+NOT_FOUND_BODY = b'{"detail":"URL not found or expired"}'
+NOT_FOUND_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(NOT_FOUND_BODY)).encode()),
+]
+
+# Те же безопасные символы, что у starlette.responses.RedirectResponse
+_SAFE_URL_CHARS = ":/%#?=@[]!$&'()*+,;"
+
+
+def wants_json(headers) -> bool:
+    """Клиент API просит JSON вместо настоящего редиректа"""
+    for name, value in headers:
+        if name == b"accept":
+            return b"application/json" in value
+    return False
+
+
+def redirect_headers(location: str, cache_control: str = None):
+    headers = [
+        (b"location", quote(location, safe=_SAFE_URL_CHARS).encode("latin-1")),
+        (b"content-length", b"0"),
+    ]
+    if cache_control:
+        headers.append((b"cache-control", cache_control.encode("latin-1")))
+    return headers
+
+
+class RedirectFastPath:
+    """ASGI-middleware: GET /<alias> для alias из кэша отдается сразу
+
+    Без маршрутизации FastAPI, зависимостей, сессии БД и сериализации
+    pydantic/JSON. resolve(alias, scope) возвращает адрес для редиректа или
+    None - тогда запрос идет обычным путем (промах кэша, 404, JSON-клиент).
+
+    reject(alias) -> True - alias заведомо не существует (фильтр Блума),
+    ответ 404 тоже уходит сразу. reserved - первые сегменты путей обычных
+    маршрутов (metrics, docs, stats): такие запросы идут мимо resolve и
+    reject, не искажая счетчики кэша.
+    """
+
+    def __init__(
+        self,
+        app,
+        resolve,
+        status_code=302,
+        cache_control=None,
+        reject=None,
+        reserved=(),
+    ):
+        if status_code not in REDIRECT_STATUSES:
+            raise ValueError(f"Unsupported redirect status: {status_code}")
+        self.app = app
+        self.resolve = resolve
+        self.status_code = status_code
+        self.cache_control = cache_control
+        self.reject = reject
+        self.reserved = frozenset(reserved)
+        self.hits = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            alias = scope["path"][1:]
+            if (
+                alias
+                and "/" not in alias
+                and alias not in self.reserved
+                and await self._handle(alias, scope, send)
+            ):
+                return
+        await self.app(scope, receive, send)
+
+    async def _handle(self, alias, scope, send):
+        """True - ответ уже отправлен"""
+        if not wants_json(scope["headers"]):
+            location = self.resolve(alias, scope)
+            if location is not None:
+                self.hits += 1
+                # Для метрик: запрос обслужен быстрым путем, а не маршрутом
+                scope["endpoint"] = self.resolve
+                headers = redirect_headers(location, self.cache_control)
+                await _respond(send, self.status_code, headers)
+                return True
+        if self.reject is None or not self.reject(alias):
+            return False
+        self.rejected += 1
+        scope["endpoint"] = self.reject
+        await _respond(send, 404, NOT_FOUND_HEADERS, NOT_FOUND_BODY)
+        return True
+
+
+async def _respond(send, status, headers, body=b""):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
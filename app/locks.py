@@ -0,0 +1,68 @@
+"""Межпроцессная блокировка на файле (flock) для воркеров одного узла
+
+Блокировку держит открытый файл: она снимается при release() и при
+завершении процесса, поэтому упавший владелец ее не "подвешивает". Не в
+app/shared_cache.py: тот модуль только для Unix, а миграции и
+обслуживание запускаются везде.
+"""
+
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Не Unix: несколько воркеров (WORKER_MODE=multi) там не запускаются,
+    # блокировка всегда считается занятой этим процессом
+    fcntl = None
+
+
+class FileLock:
+    """Эксклюзивная flock-блокировка файла path
+
+    with FileLock(path): ... - ждать блокировку; acquire(blocking=False) -
+    попытка без ожидания, False - блокировку держит другой процесс.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._held = False
+
+    @property
+    def held(self):
+        return self._held
+
+    def acquire(self, blocking=True):
+        if self._held:
+            return True
+        if fcntl is None:
+            self._held = True
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(
+                fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            )
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._held = True
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            # Закрытие файла снимает блокировку
+            os.close(self._fd)
+            self._fd = None
+        self._held = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
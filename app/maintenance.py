@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+
+from app.locks import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class Sweeper:
+    """Периодическое обслуживание базы в фоновом потоке
+
+    jobs - список (имя, функция без аргументов). Функция возвращает число
+    обработанных строк; ошибка одной задачи не мешает остальным.
+
+    С lock_path задачи над базой выполняет только один процесс - ведущий,
+    державший flock на этом файле; остальные пробуют занять блокировку на
+    каждом проходе и сменят ведущего, если тот завершится. Задачи из local
+    (состояние в памяти процесса) выполняются в каждом процессе.
+    """
+
+    def __init__(self, jobs, interval=300.0, lock_path=None, local=()):
+        self.jobs = list(jobs)
+        self.interval = interval
+        self.local = set(local)
+        self._leader_lock = FileLock(lock_path) if lock_path else None
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._run_lock = threading.Lock()
+        self.runs = 0
+        self.errors = 0
+        self.last_run = None
+        self.totals = {name: 0 for name, _ in self.jobs}
+
+    def start(self):
+        if self._thread is not None or not self.interval:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            thread.join()
+            self._thread = None
+        if self._leader_lock is not None:
+            # Ведущим станет другой процесс на своем следующем проходе
+            self._leader_lock.release()
+
+    def is_leader(self):
+        """Держит ли процесс блокировку ведущего (занимает ее, если свободна)"""
+        lock = self._leader_lock
+        if lock is None or lock.held:
+            return True
+        if not lock.acquire(blocking=False):
+            return False
+        logger.info("Обслуживание базы выполняет процесс %d", os.getpid())
+        return True
+
+    def run_once(self):
+        """Один проход всех задач, возвращает {имя: обработано строк}"""
+        results = {}
+        with self._run_lock:
+            leader = self.is_leader()
+            for name, job in self.jobs:
+                if self._stopping:
+                    break
+                if not leader and name not in self.local:
+                    continue
+                started = time.monotonic()
+                try:
+                    results[name] = job() or 0
+                except Exception:
+                    logger.exception("Ошибка задачи обслуживания %s", name)
+                    self.errors += 1
+                    continue
+                self.totals[name] += results[name]
+                logger.info(
+                    "%s: %d за %.2f с", name, results[name], time.monotonic() - started
+                )
+            self.runs += 1
+            self.last_run = time.time()
+        return results
+
+    def _run(self):
+        while not self._stopping:
+            self.run_once()
+            self._wakeup.wait(self.interval)
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "leader": int(self._leader_lock is None or self._leader_lock.held),
+            **self.totals,
+        }
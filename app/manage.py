@@ -0,0 +1,54 @@
+"""Обслуживание базы из командной строки
+
+python -m app.manage migrate   # создать/обновить таблицы и индексы
+python -m app.manage check     # код 1, если схема отстает от моделей
+python -m app.manage vacuum    # SQLite: включить auto_vacuum=INCREMENTAL
+"""
+
+import argparse
+import sys
+
+from app.database import engine
+from app.schema import schema_problems
+from app.simple_app import OBSOLETE_INDEXES, Base, migrate
+
+
+def check():
+    problems = schema_problems(engine, Base.metadata, OBSOLETE_INDEXES)
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print("schema is up to date")
+    return 1 if problems else 0
+
+
+def vacuum():
+    """Полный VACUUM: нужен один раз, чтобы на старой базе заработал
+    incremental_vacuum фонового обслуживания. Блокирует базу на время работы"""
+    if engine.dialect.name != "sqlite":
+        print("vacuum is only needed for SQLite")
+        return 0
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    print(f"auto_vacuum={mode}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("migrate", "check", "vacuum"))
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        migrate(engine)
+        print("schema is up to date")
+        return 0
+    if args.command == "check":
+        return check()
+    return vacuum()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Метрики сервиса в текстовом формате Prometheus (без prometheus_client)
+
+- MetricsMiddleware: гистограмма времени ответа и счетчик ответов по
+  маршруту (имя обработчика из scope["endpoint"]);
+- instrument_engine: хуки SQLAlchemy считают запросы к БД и их время, в
+  том числе отдельно по каждому HTTP-запросу (видно N+1);
+- Registry.collector: значения, которые снимаются в момент скрейпа
+  (кэши, буфер кликов, пулы соединений).
+
+При METRICS_ENABLED=false ничего из этого не подключается.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# [число запросов, секунд в БД] текущего HTTP-запроса; None вне запроса
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        # labels -> [счетчики по бакетам (+Inf последним), сумма, количество]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                label_text = _labels(names, labels + (bound,))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets, label_names=()):
+        metric = Histogram(name, help_text, buckets, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """collect() -> [(имя, тип, описание, {метки} или None, значение)]"""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        described = set()
+        for collect in self._collectors:
+            for name, kind, help_text, labels, value in collect():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                labels = labels or {}
+                lines.append(f"{name}{_labels(labels, labels.values())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """Метрики HTTP-запросов и запросов к БД"""
+
+    def __init__(self):
+        self.registry = Registry()
+        self.requests = self.registry.counter(
+            "http_requests_total", "HTTP responses", ("route", "status")
+        )
+        self.request_duration = self.registry.histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency",
+            LATENCY_BUCKETS,
+            ("route",),
+        )
+        self.request_queries = self.registry.histogram(
+            "http_request_db_queries",
+            "Database queries per HTTP request",
+            QUERY_COUNT_BUCKETS,
+            ("route",),
+        )
+        self.request_db_time = self.registry.histogram(
+            "http_request_db_seconds",
+            "Time spent in the database per HTTP request",
+            LATENCY_BUCKETS,
+            ("route",),
+        )
+        self.db_queries = self.registry.histogram(
+            "db_query_duration_seconds",
+            "Database query latency (request or background)",
+            LATENCY_BUCKETS,
+            ("source",),
+        )
+
+    def observe_query(self, seconds):
+        queries = _request_queries.get()
+        if queries is None:
+            self.db_queries.observe(("background",), seconds)
+            return
+        queries[0] += 1
+        queries[1] += seconds
+        self.db_queries.observe(("request",), seconds)
+
+    def observe_request(self, route, status, seconds, queries):
+        self.requests.inc((route, status))
+        self.request_duration.observe((route,), seconds)
+        self.request_queries.observe((route,), queries[0])
+        self.request_db_time.observe((route,), queries[1])
+
+    def render(self):
+        return self.registry.render()
+
+
+def route_name(scope):
+    # После маршрутизации Starlette кладет обработчик в scope["endpoint"]
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время ответа, статус и запросы к БД по маршруту"""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_queries.reset(token)
+            self.metrics.observe_request(
+                route_name(scope), status, time.perf_counter() - started, queries
+            )
+
+
+def instrument_engine(engine, metrics):
+    """Хуки before/after_cursor_execute на синхронном движке (или sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        metrics.observe_query(time.perf_counter() - started)
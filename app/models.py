@@ -1,25 +0,0 @@
-from sqlalchemy import Column, Integer, String
-
-from app.database import Base
-
-
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True)
-    name = Column(String)
-
-
-class Item(Base):
-    __tablename__ = "items"
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    description = Column(String)
-
-
-# Добавляем модель URL если нужна
-class URL(Base):
-    __tablename__ = "urls"
-    id = Column(Integer, primary_key=True, index=True)
-    original_url = Column(String, index=True)
-    short_code = Column(String, unique=True, index=True)
@@ -0,0 +1,26 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Непрозрачный курсор на позицию (created_at, id) в списке"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Разбирает курсор обратно в (created_at, id); ValueError если он битый"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def after_cursor(query, created_at_column, id_column, cursor: str):
+    """Keyset-условие: строки строго после курсора в порядке (created_at, id)"""
+    created_at, row_id = decode_cursor(cursor)
+    return query.where(tuple_(created_at_column, id_column) > (created_at, row_id))
@@ -0,0 +1,131 @@
+"""Хеширование паролей (scrypt) в отдельном ограниченном пуле потоков
+
+Формат хеша: scrypt$<n>$<r>$<p>$<соль base64>$<ключ base64>. Строка без
+префикса scrypt$ - пароль, сохраненный открытым текстом до появления
+хеширования; она проверяется как раньше и помечается для перехеширования.
+
+hashlib.scrypt отпускает GIL, поэтому хватает пула потоков: N потоков
+загружают N ядер, цикл событий при этом не блокируется. Очередь ограничена:
+когда заняты все потоки и queue_size мест в очереди, PasswordHasher сразу
+бросает HasherBusy - вызывающий отвечает 503 вместо роста задержки у всех.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PREFIX = "scrypt"
+
+
+class HasherBusy(Exception):
+    """Пул хеширования и его очередь заполнены"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def hash_password(password, n=2**14, r=8, p=1):
+    salt = os.urandom(16)
+    key = hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_maxmem(n, r), dklen=32
+    )
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def _maxmem(n, r):
+    # scrypt требует 128 * n * r байт; запас сверху под служебные буферы
+    return 128 * n * r * 2 + 1024 * 1024
+
+
+def verify_password(stored, password, n=2**14, r=8, p=1):
+    """(пароль верен, хеш нужно пересчитать с текущими параметрами)"""
+    if not stored.startswith(PREFIX + "$"):
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    _, stored_n, stored_r, stored_p, salt, key = stored.split("$")
+    stored_n, stored_r, stored_p = int(stored_n), int(stored_r), int(stored_p)
+    expected = base64.b64decode(key)
+    actual = hashlib.scrypt(
+        password.encode(),
+        salt=base64.b64decode(salt),
+        n=stored_n,
+        r=stored_r,
+        p=stored_p,
+        maxmem=_maxmem(stored_n, stored_r),
+        dklen=len(expected),
+    )
+    outdated = (stored_n, stored_r, stored_p) != (n, r, p)
+    return hmac.compare_digest(actual, expected), outdated
+
+
+class PasswordHasher:
+    """Асинхронные hash/verify в пуле из workers потоков с очередью queue_size"""
+
+    def __init__(self, workers=None, queue_size=None, n=2**14, r=8, p=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self.n, self.r, self.p = n, r, p
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        # Проверка для несуществующего пользователя занимает столько же
+        # времени, сколько для существующего
+        self._dummy = None
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HasherBusy()
+            self.in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hasher"
+                )
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, function, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def hash(self, password):
+        hashed = await self._run(hash_password, password, self.n, self.r, self.p)
+        self.hashed += 1
+        return hashed
+
+    async def verify(self, stored, password):
+        """(пароль верен, хеш нужно пересчитать); stored=None - нет пользователя"""
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = await self._run(hash_password, "", self.n, self.r, self.p)
+            await self._run(verify_password, self._dummy, password)
+            return False, False
+        result = await self._run(
+            verify_password, stored, password, self.n, self.r, self.p
+        )
+        self.verified += 1
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,95 @@
+"""Проверка планов горячих запросов: ни один не должен сканировать таблицу целиком
+
+Запуск: python -m app.query_plans
+Схема создается в памяти из моделей simple_app, для каждого запроса
+выполняется EXPLAIN QUERY PLAN. Код возврата 1, если где-то есть SCAN.
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+from app.pagination import after_cursor, encode_cursor
+from app.simple_app import (
+    URL,
+    Base,
+    URLClick,
+    URLClickRollup,
+    User,
+    click_windows_query,
+    export_clicks_query,
+    export_urls_query,
+    stale_buckets,
+    user_urls_query,
+)
+
+
+def hot_queries():
+    now = datetime.utcnow()
+    return {
+        "auth: user by username": select(User).where(User.username == "admin"),
+        "redirect: url by alias": select(URL).where(URL.alias == "abcdefgh"),
+        "list_urls: active": user_urls_query(1, active_only=True).limit(100),
+        "list_urls: all": user_urls_query(1, active_only=False).limit(100),
+        "list_urls: keyset page": after_cursor(
+            user_urls_query(1, active_only=True),
+            URL.created_at,
+            URL.id,
+            encode_cursor(now, 1000),
+        ).limit(100),
+        "deactivate: url by id and owner": select(URL).where(
+            URL.id == 1, URL.owner_id == 1
+        ),
+        "stats: click windows": click_windows_query(1, now),
+        "clicks: window by url": select(func.count())
+        .select_from(URLClick)
+        .where(URLClick.url_id == 1, URLClick.clicked_at >= now - timedelta(hours=1)),
+        "export: urls by creation time": export_urls_query(
+            1, since=now - timedelta(days=30), until=now
+        ),
+        "export: clicks by time": export_clicks_query(
+            1, since=now - timedelta(days=30), until=now
+        ),
+        "sweeper: expired active links": select(URL.id, URL.alias)
+        .where(URL.is_active == True, URL.expires_at < now)
+        .limit(1000),
+        "sweeper: stale buckets by url range": select(URLClickRollup.url_id).where(
+            stale_buckets(0, 1000, now)
+        ),
+    }
+
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    positional = tuple(params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", positional)
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    # "SCAN t" и "SCAN t USING INDEX" - полный проход; SEARCH - поиск по индексу
+    return [step for step in plan if step.startswith("SCAN ")]
+
+
+def main():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    failed = False
+    with engine.connect() as conn:
+        for name, statement in hot_queries().items():
+            plan = explain(conn, statement)
+            scans = full_scans(plan)
+            status = "FAIL" if scans else "ok"
+            print(f"[{status}] {name}")
+            for step in plan:
+                print(f"       {step}")
+            failed = failed or bool(scans)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
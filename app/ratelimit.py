@@ -0,0 +1,181 @@
+"""Ограничение частоты запросов: token bucket на клиента и маршрут
+
+Клиент - IP, а на маршрутах с авторизацией (per_user) - имя пользователя,
+если его учетные данные уже проверены (verify, например кэш учетных
+данных); непроверенное имя из заголовка ключом не служит. У каждого правила
+(маршрута) свое ведро на клиента: rate токенов в секунду, не больше burst.
+Запрос без токена получает 429 с Retry-After до появления следующего.
+
+TokenBuckets хранит ведра в памяти процесса (OrderedDict в порядке
+обращений): при max_keys ведрах вытесняется самое давно не использованное,
+обращение и вытеснение - O(1). Для WORKER_MODE=multi есть общий для воркеров
+SharedTokenBuckets (app/shared_cache.py) с тем же интерфейсом.
+"""
+
+import base64
+import binascii
+import math
+import re
+import time
+from collections import OrderedDict, namedtuple
+
+# endpoint - обработчик маршрута (имя правила и метка в метриках),
+# pattern - регулярное выражение для пути, rate - токенов в секунду,
+# per_user - ведро на проверенного пользователя вместо IP
+RateRule = namedtuple(
+    "RateRule", ["endpoint", "method", "pattern", "rate", "burst", "per_user"]
+)
+
+TOO_MANY_BODY = b'{"detail":"Too many requests"}'
+
+
+def parse_limit(value):
+    """Строка "rate:burst" -> (rate, burst); "0" или пустая - без лимита"""
+    rate, _, burst = value.partition(":")
+    rate = float(rate or 0)
+    if rate <= 0:
+        return None
+    burst = float(burst) if burst else max(rate, 1.0)
+    if burst < 1:
+        raise ValueError(f"Rate limit burst must be at least 1: {value!r}")
+    return rate, burst
+
+
+def make_rule(endpoint, method, pattern, limit, per_user=False):
+    """RateRule из строки настройки; None - лимит выключен"""
+    parsed = parse_limit(limit)
+    if parsed is None:
+        return None
+    return RateRule(endpoint, method, re.compile(pattern), *parsed, per_user)
+
+
+def basic_credentials(scope):
+    """(имя, пароль) из заголовка Authorization: Basic или None"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, credentials = value.partition(b" ")
+            if scheme.lower() != b"basic":
+                return None
+            try:
+                decoded = base64.b64decode(credentials, validate=True).decode()
+            except (binascii.Error, ValueError):
+                return None
+            username, separator, password = decoded.partition(":")
+            return (username, password) if separator else None
+    return None
+
+
+def client_key(scope, verify=None):
+    """user:<имя>, если verify(имя, пароль) подтвердил учетные данные,
+    иначе ip:<адрес>"""
+    if verify is not None:
+        credentials = basic_credentials(scope)
+        if credentials is not None and verify(*credentials):
+            return "user:" + credentials[0]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class TokenBuckets:
+    """Ведра key -> [токены, время обновления] в памяти процесса"""
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self.evictions = 0
+
+    def take(self, key, rate, burst):
+        """Списывает токен; 0 - запрос пропущен, иначе секунд до токена"""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            bucket = self._buckets[key] = [burst, now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    def stats(self):
+        return {
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+        }
+
+
+class RateLimiter:
+    """Ведра (TokenBuckets или SharedTokenBuckets) и счетчики для метрик"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.allowed = 0
+        self.throttled = {}
+
+    def check(self, rule, client):
+        """0 - запрос пропущен, иначе секунд до следующего токена"""
+        name = rule.endpoint.__name__
+        retry_after = self.buckets.take(f"{name}|{client}", rule.rate, rule.burst)
+        if retry_after:
+            self.throttled[name] = self.throttled.get(name, 0) + 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def stats(self):
+        stats = dict(self.buckets.stats())
+        stats["allowed"] = self.allowed
+        stats["throttled"] = sum(self.throttled.values())
+        for name, count in self.throttled.items():
+            stats[f"{name}_throttled"] = count
+        return stats
+
+
+class RateLimitMiddleware:
+    """ASGI-middleware: 429 сверх лимита до маршрутизации и быстрого пути
+
+    Правило - первое из rules, у которого совпали метод и путь; запросы
+    без правила проходят без проверки. verify(имя, пароль) -> True -
+    учетные данные уже проверены (правила per_user).
+    """
+
+    def __init__(self, app, limiter, rules, verify=None):
+        self.app = app
+        self.limiter = limiter
+        self.rules = [rule for rule in rules if rule is not None]
+        self.verify = verify
+
+    def _match(self, scope):
+        for rule in self.rules:
+            if rule.method == scope["method"] and rule.pattern.match(scope["path"]):
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            rule = self._match(scope)
+            if rule is not None:
+                verify = self.verify if rule.per_user else None
+                retry_after = self.limiter.check(rule, client_key(scope, verify))
+                if retry_after:
+                    # Для метрик: 429 засчитывается маршруту правила
+                    scope["endpoint"] = rule.endpoint
+                    await self._throttle(send, retry_after)
+                    return
+        await self.app(scope, receive, send)
+
+    async def _throttle(self, send, retry_after):
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(TOO_MANY_BODY)).encode()),
+            (b"retry-after", str(math.ceil(retry_after)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": TOO_MANY_BODY})
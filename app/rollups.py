@@ -0,0 +1,25 @@
+from collections import Counter
+from datetime import datetime
+
+# Размеры бакетов предагрегации кликов, в секундах
+MINUTE = 60
+HOUR = 3600
+BUCKET_SIZES = (MINUTE, HOUR)
+
+
+def bucket_start(moment: datetime, size: int) -> datetime:
+    """Начало бакета размера size, в который попадает moment"""
+    if size == MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    if size == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported bucket size: {size}")
+
+
+def rollup_counts(clicks):
+    """Считает клики по (url_id, размер бакета, начало бакета)"""
+    counts = Counter()
+    for click in clicks:
+        for size in BUCKET_SIZES:
+            counts[(click.url_id, size, bucket_start(click.clicked_at, size))] += 1
+    return counts
@@ -1,13 +0,0 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-
-from app import models
-from app.database import get_db
-
-router = APIRouter(prefix="/users", tags=["users"])
-
-
-@router.get("/")
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(models.User).all()
-    return users
@@ -0,0 +1,46 @@
+"""Проверка и обновление схемы БД
+
+Таблицы не создаются при импорте модулей: при запуске приложение только
+сверяет схему с моделями (schema_problems), а создает недостающее
+upgrade_schema - из python -m app.manage migrate или из lifespan при
+SCHEMA_AUTO_MIGRATE=true.
+
+DDL идемпотентен (IF NOT EXISTS / IF EXISTS): одновременные миграции из
+нескольких процессов не падают на уже созданных таблицах. Воркеры одного
+узла вдобавок выполняют миграцию по очереди (app/locks.py).
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+def schema_problems(bind, metadata, obsolete_indexes=()):
+    """Расхождения базы с моделями: ["missing table urls", ...]"""
+    inspector = inspect(bind)
+    existing = set(inspector.get_table_names())
+    problems = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            problems.append(f"missing table {table.name}")
+            continue
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                problems.append(f"missing index {index.name}")
+        for name in obsolete_indexes:
+            if name in indexes:
+                problems.append(f"obsolete index {name}")
+    return problems
+
+
+def upgrade_schema(bind, metadata, obsolete_indexes=()):
+    """Создает недостающие таблицы и индексы, удаляет устаревшие индексы"""
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            conn.execute(CreateTable(table, if_not_exists=True))
+        for name in obsolete_indexes:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        # Индексы отдельно: в уже существующие таблицы тоже добавляются
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -26,6 +26,7 @@ class URLCreateResponse(URLBase):
 class URLList(URLCreateResponse):
     is_active: bool
     clicks_count: int
+    owner_id: int
 
 
 class URLStats(BaseModel):
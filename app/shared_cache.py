@@ -0,0 +1,467 @@
+"""Общий для всех воркеров кэш alias и рассылка инвалидаций
+
+Только для Unix (mmap + fcntl + Unix-сокеты), включается WORKER_MODE=multi.
+
+SharedAliasCache - хеш-таблица с открытой адресацией в mmap-файле (обычно
+в /dev/shm). Запись (промах кэша, деактивация) идет под flock, чтение без
+блокировок: у каждого слота есть счетчик версии (seqlock), нечетное значение
+означает, что слот сейчас переписывается.
+
+SharedTokenBuckets - ведра ограничения частоты запросов в отдельном mmap-файле,
+общие для воркеров: лимит действует на клиента, а не на воркер.
+
+InvalidationBus - по Unix datagram-сокету на воркер в общем каталоге;
+publish() рассылает сообщение всем остальным воркерам, подписчики
+сбрасывают свое локальное состояние (например, кэш учетных данных).
+
+TrendingExchange - топы популярных alias (app/trending.py) воркеров в
+общем каталоге: каждый воркер периодически публикует свой, запрос
+складывает топы всех воркеров.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.cache import CachedURL
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+EMPTY, FULL, DELETED = 0, 1, 2
+
+# seq, state, is_active, alias_len, url_id, expires_at, stored_at, url_len
+_HEADER = struct.Struct("<IBBBxqddH")
+_ALIAS_SIZE = 64
+_PROBES = 8
+
+# Ведро SharedTokenBuckets: хеш ключа, токены, время обновления
+_BUCKET = struct.Struct("<Qdd")
+
+
+class SharedAliasCache:
+    """Кэш alias -> CachedURL в разделяемой памяти, интерфейс как у TTLCache"""
+
+    def __init__(self, path, slots=16384, slot_size=1024, ttl=60.0):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.max_url_size = slot_size - _HEADER.size - _ALIAS_SIZE
+        size = slots * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _slot_indexes(self, key: bytes):
+        start = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+        return [(start + i) % self.slots for i in range(_PROBES)]
+
+    def _read(self, index):
+        """Согласованный снимок слота: (header, alias, url) или None"""
+        offset = index * self.slot_size
+        for _ in range(100):
+            header = _HEADER.unpack_from(self._map, offset)
+            if header[0] & 1:
+                continue
+            alias_len, url_len = header[3], header[7]
+            if alias_len > _ALIAS_SIZE or url_len > self.max_url_size:
+                # Слот испорчен (например, процесс упал посреди записи)
+                return None
+            alias_start = offset + _HEADER.size
+            alias_end = alias_start + alias_len
+            alias = self._map[alias_start:alias_end]
+            url_start = alias_start + _ALIAS_SIZE
+            url_end = url_start + url_len
+            url = self._map[url_start:url_end]
+            if _HEADER.unpack_from(self._map, offset)[0] == header[0]:
+                return header, alias, url
+        return None
+
+    def _write(self, index, state, alias=b"", value=None, stored_at=0.0, url=b""):
+        """url - value.original_url в UTF-8, длина уже проверена"""
+        offset = index * self.slot_size
+        # Нечетная версия: читатели пропускают слот, пока он переписывается.
+        # Нечетная версия, оставшаяся от упавшего писателя, тоже подходит
+        seq = _HEADER.unpack_from(self._map, offset)[0] & ~1
+        struct.pack_into("<I", self._map, offset, seq + 1)
+        if value is None:
+            url, url_id, is_active, expires_at = b"", 0, 0, 0.0
+        else:
+            url_id, is_active = value.url_id, int(bool(value.is_active))
+            expires_at = (value.expires_at - EPOCH).total_seconds()
+        alias_start = offset + _HEADER.size
+        alias_end = alias_start + len(alias)
+        self._map[alias_start:alias_end] = alias
+        url_start = alias_start + _ALIAS_SIZE
+        url_end = url_start + len(url)
+        self._map[url_start:url_end] = url
+        _HEADER.pack_into(
+            self._map,
+            offset,
+            seq + 1,
+            state,
+            is_active,
+            len(alias),
+            url_id,
+            expires_at,
+            stored_at,
+            len(url),
+        )
+        struct.pack_into("<I", self._map, offset, seq + 2)
+
+    def _find(self, key: bytes):
+        for index in self._slot_indexes(key):
+            snapshot = self._read(index)
+            if snapshot is None:
+                continue
+            header, alias, url = snapshot
+            if header[1] == EMPTY:
+                return None
+            if header[1] == FULL and alias == key:
+                return index, header, url
+        return None
+
+    def get(self, key):
+        found = self._find(key.encode())
+        if found is None:
+            self.misses += 1
+            return None
+        _, header, url = found
+        _, _, is_active, _, url_id, expires_at, stored_at, _ = header
+        if time.time() - stored_at > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedURL(
+            url_id,
+            url.decode(),
+            bool(is_active),
+            EPOCH + timedelta(seconds=expires_at),
+        )
+
+    def set(self, key, value):
+        alias = key.encode()
+        # Длины в байтах: в слот пишется UTF-8
+        url = value.original_url.encode()
+        if len(alias) > _ALIAS_SIZE or len(url) > self.max_url_size:
+            return False
+        now = time.time()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            target = None
+            oldest = None
+            for index in self._slot_indexes(alias):
+                snapshot = self._read(index)
+                if snapshot is None:
+                    # Испорченный слот занимаем как удаленный
+                    if target is None:
+                        target = index
+                    continue
+                header, slot_alias, _ = snapshot
+                state, stored_at = header[1], header[6]
+                if state == FULL and slot_alias == alias:
+                    target = index
+                    break
+                if state != FULL or now - stored_at > self.ttl:
+                    if target is None:
+                        target = index
+                    if state == EMPTY:
+                        break
+                elif oldest is None or stored_at < oldest[1]:
+                    oldest = (index, stored_at)
+            if target is None:
+                target = oldest[0]
+                self.evictions += 1
+            self._write(target, FULL, alias, value, now, url)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return True
+
+    def invalidate(self, key):
+        alias = key.encode()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            found = self._find(alias)
+            if found is not None:
+                self._write(found[0], DELETED)
+                self.invalidations += 1
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def clear(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            for index in range(self.slots):
+                self._write(index, EMPTY)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SharedTokenBuckets:
+    """Ведра ограничения частоты (app/ratelimit.py) в разделяемой памяти
+
+    Слот - хеш ключа, токены и время обновления (time.time(): часы общие
+    для процессов). Ключ ищется среди _PROBES соседних слотов (окно не
+    переходит через конец файла); новый ключ занимает пустой слот или
+    вытесняет самый давно не обновлявшийся. Списание токена - чтение и
+    запись слота под блокировкой байтов окна (fcntl.lockf): воркеры ждут
+    друг друга, только если окна их ключей пересекаются. Блокировки lockf
+    принадлежат процессу, а не потоку: take вызывается из цикла событий.
+    """
+
+    def __init__(self, path, slots=65536):
+        if slots < _PROBES:
+            raise ValueError(f"SharedTokenBuckets needs at least {_PROBES} slots")
+        self.path = path
+        self.slots = slots
+        size = slots * _BUCKET.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self.evictions = 0
+
+    def take(self, key, rate, burst):
+        """Списывает токен; 0 - запрос пропущен, иначе секунд до токена"""
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # 0 - пустой слот
+        key_hash = int.from_bytes(digest, "little") | 1
+        now = time.time()
+        start = key_hash % (self.slots - _PROBES + 1) * _BUCKET.size
+        length = _PROBES * _BUCKET.size
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            offset, tokens, updated = self._find(key_hash, start)
+            if tokens is None:
+                tokens = burst
+            else:
+                tokens = min(burst, tokens + max(now - updated, 0.0) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            _BUCKET.pack_into(self._map, offset, key_hash, tokens, now)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def _find(self, key_hash, start):
+        """(смещение слота, токены, время); токены None - ведро новое"""
+        oldest = None
+        for i in range(_PROBES):
+            offset = start + i * _BUCKET.size
+            stored, tokens, updated = _BUCKET.unpack_from(self._map, offset)
+            if stored == key_hash:
+                return offset, tokens, updated
+            if stored == 0:
+                return offset, None, None
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        self.evictions += 1
+        return oldest[0], None, None
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self):
+        return {"slots": self.slots, "evictions": self.evictions}
+
+
+class InvalidationBus:
+    """Рассылка сообщений об инвалидации между воркерами через Unix-сокеты"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._handlers = {}
+        self._socket = None
+        self._thread = None
+        self.sent = 0
+        self.received = 0
+
+    def subscribe(self, kind, handler):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def start(self):
+        if self._socket is not None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        self._thread = threading.Thread(
+            target=self._listen, name="invalidation-bus", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._socket is None:
+            return
+        sock, self._socket = self._socket, None
+        sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def publish(self, kind, key):
+        message = json.dumps({"kind": kind, "key": key}).encode()
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if path == self.path or not name.endswith(".sock"):
+                    continue
+                try:
+                    sender.sendto(message, path)
+                    self.sent += 1
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Сокет остался от завершившегося воркера
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError:
+                    logger.warning("Не удалось отправить инвалидацию в %s", path)
+        finally:
+            sender.close()
+
+    def _listen(self):
+        while self._socket is not None:
+            try:
+                data = self._socket.recv(65536)
+            except OSError:
+                return
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            self.received += 1
+            for handler in self._handlers.get(message.get("kind"), ()):
+                try:
+                    handler(message.get("key"))
+                except Exception:
+                    logger.exception("Ошибка обработки инвалидации %r", message)
+
+
+class TrendingExchange:
+    """Топы TrendingAliases всех воркеров: публикация в файлы и сложение
+
+    Фоновый поток раз в interval секунд пишет top(окно, capacity) этого
+    воркера в <directory>/<pid>.json (через переименование, читатели не
+    видят файл наполовину). top() складывает набросок этого воркера с
+    файлами остальных; файлы старше stale_after (воркер завершился)
+    пропускаются и удаляются. Данные других воркеров отстают не больше
+    чем на interval, alias вне их топ-capacity не учитываются.
+    """
+
+    def __init__(self, directory, trending, interval=5.0, stale_after=None):
+        self.directory = directory
+        self.trending = trending
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.published = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._wakeup.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="trending-exchange", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._wakeup.set()
+        thread.join()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def publish(self):
+        capacity = self.trending.capacity
+        snapshot = {
+            name: self.trending.top(name, capacity) for name in self.trending.rings
+        }
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, self.path)
+        self.published += 1
+
+    def _run(self):
+        while not self._wakeup.is_set():
+            try:
+                self.publish()
+            except OSError:
+                logger.exception("Не удалось опубликовать топ alias")
+            self._wakeup.wait(self.interval)
+
+    def _others(self):
+        now = time.time()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.path or not name.endswith(".json"):
+                continue
+            try:
+                if now - os.stat(path).st_mtime > self.stale_after:
+                    os.unlink(path)
+                    continue
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                # Файл удален или заменен во время чтения
+                continue
+        return snapshots
+
+    def top(self, window, limit=10):
+        """Как TrendingAliases.top, но по кликам всех воркеров"""
+        extra = [snapshot.get(window, ()) for snapshot in self._others()]
+        return self.trending.top(window, limit, extra)
+
+    def stats(self):
+        return {"published": self.published}
@@ -1,11 +1,28 @@
-import secrets
-import string
+import json
+import re
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import List
-
-from fastapi import Depends, FastAPI, HTTPException, Request, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from pydantic import BaseModel
+from functools import partial
+from itertools import islice
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from fastapi.responses import (
+    ORJSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
+from pydantic import BaseModel, Field, ValidationError
 
 # Создаем простую базу данных прямо здесь
 from sqlalchemy import (
@@ -13,20 +30,72 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
-    create_engine,
+    and_,
+    bindparam,
+    case,
+    delete,
+    event,
+    func,
+    insert,
+    or_,
+    select,
+    update,
 )
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, relationship, sessionmaker
-
-# SQLite база данных
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from sqlalchemy.orm import relationship
+from starlette.concurrency import run_in_threadpool
+
+from app.aliases import make_allocator
+from app.aliases import metadata as alias_metadata
+from app.auth import (
+    AuthenticatedUser,
+    CredentialCache,
+    credentials_digest,
+    current_user_dependency,
+)
+from app.bloom import AliasFilter
+from app.cache import CachedURL, TTLCache
+from app.click_sinks import (
+    BrokerSink,
+    FunctionSink,
+    LocalBroker,
+    NdjsonSegmentSink,
+    ParquetSegmentSink,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.click_store import ColumnarClickStore
+from app.clicks import Click, ClickBuffer
+from app.config import settings
+
+# Движки и сессии (основная база и реплика для чтения) берем из app.database
+from app.database import (
+    SessionLocal,
+    async_engine,
+    async_read_engine,
+    async_session_scope,
+    dialect_insert,
+    dispose_engines,
+    engine,
+    get_async_db,
+    get_async_read_db,
+    read_engine,
+    stream_partitions,
+)
+from app.export import EXPORT_FORMATS, export_chunks, export_headers
+from app.fastpath import RedirectFastPath, wants_json
+from app.locks import FileLock
+from app.maintenance import Sweeper
+from app.metrics import CONTENT_TYPE, Metrics, MetricsMiddleware, instrument_engine
+from app.pagination import after_cursor, encode_cursor
+from app.passwords import HasherBusy, PasswordHasher
+from app.ratelimit import RateLimiter, RateLimitMiddleware, TokenBuckets, make_rule
+from app.rollups import HOUR, MINUTE, bucket_start, rollup_counts
+from app.schema import schema_problems, upgrade_schema
+from app.schemas import URLList
+from app.trending import TrendingAliases
 
 Base = declarative_base()
 
@@ -41,6 +110,9 @@ class URLClick(Base):
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
 
+    # Окно кликов по ссылке: WHERE url_id = ? AND clicked_at >= ?
+    __table_args__ = (Index("ix_url_clicks_url_id_clicked_at", "url_id", "clicked_at"),)
+
 
 # Модели
 class User(Base):
@@ -68,6 +140,37 @@ class URL(Base):
     # Связь с кликами
     clicks = relationship("URLClick", backref="url", cascade="all, delete-orphan")
 
+    # Список ссылок владельца в порядке создания. Частичные индексы (WHERE
+    # is_active) содержат только живые ссылки и не растут от истекших
+    __table_args__ = (
+        Index("ix_urls_owner_id_created_at", "owner_id", "created_at", "id"),
+        Index(
+            "ix_urls_active_owner_id_created_at",
+            "owner_id",
+            "created_at",
+            "id",
+            sqlite_where=is_active == True,
+            postgresql_where=is_active == True,
+        ),
+        # Поиск истекших активных ссылок фоновым обслуживанием
+        Index(
+            "ix_urls_active_expires_at",
+            "expires_at",
+            sqlite_where=is_active == True,
+            postgresql_where=is_active == True,
+        ),
+    )
+
+
+# Предагрегированные клики: число переходов по ссылке в минутном и часовом бакете
+class URLClickRollup(Base):
+    __tablename__ = "url_click_rollups"
+
+    url_id = Column(Integer, ForeignKey("urls.id"), primary_key=True)
+    bucket_size = Column(Integer, primary_key=True)  # MINUTE или HOUR, в секундах
+    bucket_start = Column(DateTime, primary_key=True)
+    clicks = Column(Integer, nullable=False, default=0)
+
 
 # Pydantic модель для ответа статистики
 class DetailedStatsResponse(BaseModel):
@@ -81,43 +184,629 @@ class DetailedStatsResponse(BaseModel):
     is_active: bool
 
 
-# Создаем таблицы
-Base.metadata.create_all(bind=engine)
+# Один элемент массового создания ссылок (POST /urls/bulk)
+class BulkURLItem(BaseModel):
+    original_url: str
+    # Без верхней границы расчет expires_at падает с OverflowError
+    expiration_days: int = Field(30, ge=1, le=settings.MAX_EXPIRATION_DAYS)
+
+
+# Маршруты; приложение собирает create_app() (в конце модуля)
+router = APIRouter()
+
+# Кэш горячих alias: редирект обслуживается без запроса к SQLite.
+# В режиме multi кэш общий для всех воркеров (mmap), а локальное состояние
+# воркеров сбрасывается сообщениями по invalidation_bus
+if settings.WORKER_MODE == "multi":
+    # Импорт здесь: модуль использует fcntl и Unix-сокеты
+    from app.shared_cache import (
+        InvalidationBus,
+        SharedAliasCache,
+        SharedTokenBuckets,
+        TrendingExchange,
+    )
+
+    alias_cache = SharedAliasCache(
+        settings.SHARED_CACHE_PATH,
+        slots=settings.SHARED_CACHE_SLOTS,
+        ttl=settings.ALIAS_CACHE_TTL,
+    )
+    invalidation_bus = InvalidationBus(settings.INVALIDATION_DIR)
+else:
+    alias_cache = TTLCache(
+        maxsize=settings.ALIAS_CACHE_SIZE, ttl=settings.ALIAS_CACHE_TTL
+    )
+    invalidation_bus = None
+
+
+def broadcast_invalidation(kind, key):
+    if invalidation_bus is not None:
+        invalidation_bus.publish(kind, key)
+
+
+# Фильтр Блума по активным alias (app/bloom.py); None - фильтр выключен
+if settings.ALIAS_FILTER_ENABLED:
+    alias_filter = AliasFilter(
+        capacity=settings.ALIAS_FILTER_CAPACITY,
+        error_rate=settings.ALIAS_FILTER_ERROR_RATE,
+    )
+    if invalidation_bus is not None:
+        # Новые alias других воркеров, списком на каждую вставку
+        invalidation_bus.subscribe("aliases", alias_filter.update)
+else:
+    alias_filter = None
+
+# Популярные alias за 5 минут, час и сутки (GET /stats/trending): набросок
+# в памяти процесса, пополняется каждым редиректом. В режиме multi запрос
+# складывает топы всех воркеров
+trending = TrendingAliases(capacity=settings.TRENDING_CAPACITY)
+if settings.WORKER_MODE == "multi":
+    trending_exchange = TrendingExchange(
+        settings.TRENDING_DIR, trending, interval=settings.TRENDING_SHARE_INTERVAL
+    )
+else:
+    trending_exchange = None
+
+# Ограничение частоты запросов (RateLimitMiddleware в create_app); None -
+# выключено. В режиме multi ведра общие для всех воркеров
+if not settings.RATE_LIMIT_ENABLED:
+    rate_limiter = None
+elif settings.WORKER_MODE == "multi":
+    rate_limiter = RateLimiter(
+        SharedTokenBuckets(
+            settings.RATE_LIMIT_SHARED_PATH, slots=settings.RATE_LIMIT_MAX_KEYS
+        )
+    )
+else:
+    rate_limiter = RateLimiter(TokenBuckets(settings.RATE_LIMIT_MAX_KEYS))
+
+
+def reject_unknown_alias(alias):
+    return alias_filter is not None and not alias_filter.might_contain(alias)
+
+
+# Инкремент бакетов предагрегации, несуществующие бакеты создаются
+def upsert_rollups(db, counts):
+    table = URLClickRollup.__table__
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.url_id, table.c.bucket_size, table.c.bucket_start],
+        set_={"clicks": table.c.clicks + stmt.excluded.clicks},
+    )
+    db.execute(
+        stmt,
+        [
+            {"url_id": url_id, "bucket_size": size, "bucket_start": start, "clicks": n}
+            for (url_id, size, start), n in counts.items()
+        ],
+    )
+
+
+# Запись пачки кликов: один INSERT в url_clicks и UPDATE счетчика по каждой ссылке
+# raw=False - только счетчики и бакеты (сырые клики хранит приемник columnar)
+def write_clicks(batch, raw=True):
+    clicks_per_url = Counter(click.url_id for click in batch)
+    db = SessionLocal()
+    try:
+        if raw:
+            db.execute(
+                insert(URLClick.__table__),
+                [
+                    {
+                        "url_id": click.url_id,
+                        "clicked_at": click.clicked_at,
+                        "ip_address": click.ip_address,
+                        "user_agent": click.user_agent,
+                    }
+                    for click in batch
+                ],
+            )
+        db.execute(
+            update(URL.__table__)
+            .where(URL.__table__.c.id == bindparam("url_id"))
+            .values(clicks_count=URL.__table__.c.clicks_count + bindparam("n")),
+            [{"url_id": url_id, "n": n} for url_id, n in clicks_per_url.items()],
+        )
+        upsert_rollups(db, rollup_counts(batch))
+        db.commit()
+    finally:
+        db.close()
+
+
+# Локальная замена брокера сообщений для приемника broker
+click_broker = LocalBroker(retention=settings.CLICK_BROKER_RETENTION)
 
-app = FastAPI(
-    title="URL Alias Service",
-    description="Сервис для создания коротких ссылок с расширенной статистикой",
-    version="1.0.0",
+# Колоночное хранилище сырых кликов, если включен приемник columnar
+CLICK_SINK_NAMES = [name.strip() for name in settings.CLICK_SINKS.split(",")]
+if "columnar" in CLICK_SINK_NAMES:
+    click_store = ColumnarClickStore(
+        settings.CLICK_STORE_DIR,
+        max_rows=settings.CLICK_SEGMENT_MAX_ROWS,
+        max_seconds=settings.CLICK_SEGMENT_MAX_SECONDS,
+    )
+else:
+    click_store = None
+
+# Минутные и часовые бакеты статистики пишут приемники sql и counters
+ROLLUPS_MAINTAINED = bool({"sql", "counters"} & set(CLICK_SINK_NAMES))
+
+
+def make_click_sink(name):
+    if name == "sql":
+        return FunctionSink("sql", write_clicks)
+    if name == "counters":
+        return FunctionSink("counters", partial(write_clicks, raw=False))
+    if name == "columnar":
+        return click_store
+    if name == "broker":
+        return BrokerSink(click_broker)
+    segments = {"ndjson": NdjsonSegmentSink, "parquet": ParquetSegmentSink}
+    if name not in segments:
+        raise ValueError(f"Unknown click sink: {name}")
+    return segments[name](
+        settings.CLICK_SEGMENT_DIR,
+        max_rows=settings.CLICK_SEGMENT_MAX_ROWS,
+        max_seconds=settings.CLICK_SEGMENT_MAX_SECONDS,
+    )
+
+
+# Редирект только ставит клик в очередь, запись идет в фоне пачками
+click_buffer = ClickBuffer(
+    [make_click_sink(name) for name in CLICK_SINK_NAMES],
+    max_size=settings.CLICK_BATCH_SIZE,
+    interval=settings.CLICK_FLUSH_INTERVAL,
+    max_pending=settings.CLICK_QUEUE_SIZE,
+    overflow=settings.CLICK_OVERFLOW,
 )
 
-security = HTTPBasic()
+
+def backfill_rollups():
+    # Бакеты за последние сутки по уже записанным кликам (после обновления схемы)
+    db = SessionLocal()
+    try:
+        if db.scalar(select(URLClickRollup.url_id).limit(1)) is not None:
+            return
+        since = datetime.utcnow() - timedelta(days=1)
+        clicks = db.execute(
+            select(URLClick.url_id, URLClick.clicked_at).where(
+                URLClick.clicked_at >= since
+            )
+        )
+        counts = rollup_counts(
+            Click(row.url_id, row.clicked_at, None, None) for row in clicks
+        )
+        if counts:
+            upsert_rollups(db, counts)
+            db.commit()
+    finally:
+        db.close()
+
+
+# Ссылки пользователя в порядке создания (индексы ix_urls_owner_id_*)
+def user_urls_query(user_id, active_only=True):
+    query = select(URL).where(URL.owner_id == user_id)
+    if active_only:
+        query = query.where(URL.is_active == True)
+    return query.order_by(URL.created_at, URL.id)
+
+
+# Клики за последний час и сутки по всем ссылкам пользователя одним запросом.
+# Считаем по бакетам (с точностью до бакета): час - минутные, сутки - часовые
+def click_windows_query(user_id, now):
+    hour_from = bucket_start(now - timedelta(hours=1), MINUTE)
+    day_from = bucket_start(now - timedelta(days=1), HOUR)
+    is_hour_bucket = and_(
+        URLClickRollup.bucket_size == MINUTE, URLClickRollup.bucket_start >= hour_from
+    )
+    is_day_bucket = and_(
+        URLClickRollup.bucket_size == HOUR, URLClickRollup.bucket_start >= day_from
+    )
+    return (
+        select(
+            URLClickRollup.url_id,
+            func.sum(case((is_hour_bucket, URLClickRollup.clicks), else_=0)),
+            func.sum(case((is_day_bucket, URLClickRollup.clicks), else_=0)),
+        )
+        .join(URL, URL.id == URLClickRollup.url_id)
+        .where(URL.owner_id == user_id, or_(is_hour_bucket, is_day_bucket))
+        .group_by(URLClickRollup.url_id)
+    )
+
+
+# То же по колоночному хранилищу, когда бакеты не ведутся: url_id -> (час, сутки).
+# Просматривает все клики окна, а не только ссылки пользователя
+def store_click_windows(url_ids, now):
+    hour = click_store.window_counts(now - timedelta(hours=1), now, url_ids)
+    day = click_store.window_counts(now - timedelta(days=1), now, url_ids)
+    return {url_id: (hour[url_id], clicks) for url_id, clicks in day.items()}
+
+
+# Индексы, замененные частичными: на старых базах удаляются миграцией
+OBSOLETE_INDEXES = ["ix_urls_owner_id_is_active_created_at"]
+
+
+def migrate(bind=engine):
+    """Приводит базу к моделям (python -m app.manage migrate)"""
+    upgrade_schema(bind, Base.metadata, OBSOLETE_INDEXES)
+    upgrade_schema(bind, alias_metadata)
+    backfill_rollups()
+
+
+def ensure_schema(bind=engine):
+    """Проверка схемы при запуске приложения"""
+    problems = schema_problems(bind, Base.metadata, OBSOLETE_INDEXES)
+    if not problems:
+        return
+    if not settings.SCHEMA_AUTO_MIGRATE:
+        raise RuntimeError(
+            "Схема БД не совпадает с моделями ("
+            + ", ".join(problems)
+            + "), выполните python -m app.manage migrate"
+        )
+    # Воркеры стартуют одновременно: мигрирует первый, остальные ждут его
+    # и проверяют схему заново
+    with FileLock(settings.SCHEMA_LOCK_PATH):
+        if schema_problems(bind, Base.metadata, OBSOLETE_INDEXES):
+            migrate(bind)
+
+
+# Фоновое обслуживание (app/maintenance.py). Каждая задача идет пачками с
+# коммитом после каждой, чтобы не держать блокировку записи SQLite подолгу
+def expire_links(now=None):
+    """Деактивирует истекшие ссылки и сбрасывает их из кэша alias"""
+    now = now or datetime.utcnow()
+    table = URL.__table__
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(table.c.id, table.c.alias)
+                .where(table.c.is_active == True, table.c.expires_at < now)
+                .limit(settings.MAINTENANCE_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return total
+            db.execute(
+                update(table)
+                .where(table.c.id.in_([row.id for row in rows]))
+                .values(is_active=False)
+            )
+            db.commit()
+            for row in rows:
+                alias_cache.invalidate(row.alias)
+            total += len(rows)
+    finally:
+        db.close()
+
+
+def prune_clicks(now=None):
+    """Удаляет сырые клики старше CLICK_RETENTION_DAYS
+
+    id кликов растет вместе с clicked_at, поэтому старые строки лежат в
+    начале таблицы: берем пачки по id и останавливаемся на первой свежей.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.CLICK_RETENTION_DAYS)
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(URLClick.id, URLClick.clicked_at)
+                .order_by(URLClick.id)
+                .limit(settings.MAINTENANCE_BATCH_SIZE)
+            ).all()
+            old = [row.id for row in rows if row.clicked_at < cutoff]
+            if old:
+                db.execute(delete(URLClick).where(URLClick.id.in_(old)))
+                db.commit()
+                total += len(old)
+            if not rows or len(old) < len(rows):
+                return total
+    finally:
+        db.close()
+
+
+def stale_buckets(first_url_id, last_url_id, now):
+    """Бакеты ссылок [first_url_id, last_url_id) за пределами окон хранения
+
+    Отдельного индекса по bucket_start нет (планировщик брал бы его для
+    статистики вместо поиска по владельцу), поэтому обход идет диапазонами
+    url_id по первичному ключу.
+    """
+    minute_cutoff = now - timedelta(hours=settings.MINUTE_ROLLUP_RETENTION_HOURS)
+    hour_cutoff = now - timedelta(days=settings.HOUR_ROLLUP_RETENTION_DAYS)
+    return and_(
+        URLClickRollup.url_id >= first_url_id,
+        URLClickRollup.url_id < last_url_id,
+        or_(
+            and_(
+                URLClickRollup.bucket_size == MINUTE,
+                URLClickRollup.bucket_start < minute_cutoff,
+            ),
+            and_(
+                URLClickRollup.bucket_size == HOUR,
+                URLClickRollup.bucket_start < hour_cutoff,
+            ),
+        ),
+    )
 
 
-# Функция для получения базы данных
-def get_db():
+def prune_rollups(now=None):
+    """Удаляет минутные и часовые бакеты за пределами их окон хранения"""
+    now = now or datetime.utcnow()
+    step = settings.MAINTENANCE_BATCH_SIZE
+    total = 0
     db = SessionLocal()
     try:
-        yield db
+        last_url_id = db.scalar(select(func.max(URLClickRollup.url_id))) or 0
+        for first in range(0, last_url_id + 1, step):
+            result = db.execute(
+                delete(URLClickRollup).where(stale_buckets(first, first + step, now))
+            )
+            db.commit()
+            total += result.rowcount
     finally:
         db.close()
+    return total
+
+
+def incremental_vacuum():
+    """Возвращает ОС свободные страницы (SQLite с auto_vacuum=INCREMENTAL)"""
+    if engine.dialect.name != "sqlite":
+        return 0
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        # execute() модуля sqlite3 делает один шаг (одна страница), а
+        # executescript выполняет PRAGMA до конца
+        conn.connection.driver_connection.executescript(
+            f"PRAGMA incremental_vacuum({settings.VACUUM_PAGES})"
+        )
+        return free - conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+
+def rebuild_alias_filter(force=False):
+    """Пересобирает фильтр alias, если он старше ALIAS_FILTER_REBUILD_INTERVAL:
+    так из него уходят деактивированные ссылки"""
+    if alias_filter is None:
+        return 0
+    age = alias_filter.age()
+    if not force and age is not None and age < settings.ALIAS_FILTER_REBUILD_INTERVAL:
+        return 0
+    active = URL.is_active == True
+    db = SessionLocal()
+    try:
+        count = db.scalar(select(func.count()).select_from(URL).where(active))
+        aliases = db.scalars(
+            select(URL.alias).where(active).execution_options(yield_per=10000)
+        )
+        return alias_filter.rebuild(aliases, count)
+    finally:
+        db.close()
+
+
+def prune_click_store(now=None):
+    """Удаляет суточные партиции колоночного хранилища старше
+    CLICK_STORE_RETENTION_DAYS"""
+    if click_store is None:
+        return 0
+    now = now or datetime.utcnow()
+    return click_store.prune(now - timedelta(days=settings.CLICK_STORE_RETENTION_DAYS))
+
+
+sweeper = Sweeper(
+    [
+        ("expired_links", expire_links),
+        ("pruned_clicks", prune_clicks),
+        ("pruned_rollups", prune_rollups),
+        ("pruned_click_partitions", prune_click_store),
+        ("alias_filter_items", rebuild_alias_filter),
+        ("vacuumed_pages", incremental_vacuum),
+    ],
+    interval=settings.MAINTENANCE_INTERVAL,
+    # Фильтр alias свой у каждого процесса, остальное - одно на базу
+    lock_path=settings.MAINTENANCE_LOCK_PATH,
+    local=["alias_filter_items"],
+)
+
+
+# Выделение alias без SELECT (см. app/aliases.py)
+alias_allocator = make_allocator(
+    settings.ALIAS_STRATEGY,
+    engine,
+    length=settings.ALIAS_LENGTH,
+    block_size=settings.ALIAS_BLOCK_SIZE,
+)
+
+
+# Alias в одном сообщении invalidation_bus (датаграмма до 64 КБ)
+ANNOUNCE_BATCH = 2000
 
 
-# Функция для генерации случайного alias
-def generate_alias(length=8):
-    characters = string.ascii_letters + string.digits
-    return "".join(secrets.choice(characters) for _ in range(length))
+# Вставка ссылок без проверки alias заранее: строки с занятым alias уникальный
+# индекс отбрасывает (ON CONFLICT DO NOTHING), они получают новый alias
+async def insert_urls(db: AsyncSession, rows):
+    table = URL.__table__
+    stmt = (
+        dialect_insert(table)
+        .on_conflict_do_nothing(index_elements=[table.c.alias])
+        .returning(table.c.id, table.c.alias)
+    )
+    ids = {}
+    pending = rows
+    for _ in range(settings.ALIAS_MAX_ATTEMPTS):
+        aliases = await alias_allocator.allocate(len(pending))
+        # Повтор alias внутри пачки: вставляется только первая строка, у
+        # остальных тот же конфликт, что и с alias в базе
+        first_rows = {}
+        for row, alias in zip(pending, aliases):
+            row["alias"] = alias
+            first_rows.setdefault(alias, row)
+        batch = list(first_rows.values())
+        inserted = {alias: url_id for url_id, alias in await db.execute(stmt, batch)}
+        ids.update(inserted)
+        pending = [
+            row
+            for row in pending
+            if row["alias"] not in inserted or first_rows[row["alias"]] is not row
+        ]
+        if not pending:
+            return ids
+    raise HTTPException(status_code=503, detail="Could not allocate alias")
+
+
+# Новые alias попадают в фильтр только после commit: пересборка, начатая
+# раньше, их не видит, но получит через AliasFilter.add
+def announce_aliases(aliases):
+    if alias_filter is None:
+        return
+    aliases = list(aliases)
+    alias_filter.update(aliases)
+    if invalidation_bus is not None:
+        # Одно сообщение на вставку; очень большие пачки - частями, чтобы
+        # датаграмма поместилась в буфер приема
+        for first in range(0, len(aliases), ANNOUNCE_BATCH):
+            last = first + ANNOUNCE_BATCH
+            invalidation_bus.publish("aliases", aliases[first:last])
+
+
+# Хеширование и проверка паролей (scrypt) в отдельном пуле потоков
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS or None,
+    queue_size=settings.PASSWORD_HASH_QUEUE,
+    n=settings.SCRYPT_N,
+    r=settings.SCRYPT_R,
+    p=settings.SCRYPT_P,
+)
+
+
+def hasher_busy():
+    return HTTPException(
+        status_code=503,
+        detail="Too many logins in progress, retry later",
+        headers={"Retry-After": "1"},
+    )
 
 
 # Функция для аутентификации
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
-    if user and user.hashed_password == password:
-        return user
-    return None
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await db.scalar(select(User).where(User.username == username))
+    stored = user.hashed_password if user and user.is_active else None
+    try:
+        valid, outdated = await password_hasher.verify(stored, password)
+    except HasherBusy:
+        raise hasher_busy()
+    if not valid:
+        return None
+    # Открытый пароль или старые параметры scrypt: пересчитываем хеш.
+    # Пул занят - пересчет подождет до следующего входа
+    if outdated:
+        try:
+            user.hashed_password = await password_hasher.hash(password)
+        except HasherBusy:
+            return user
+        await db.commit()
+    return user
+
+
+# Кэш проверенных учетных данных: защищенные эндпоинты не ходят в БД за
+# пользователем на каждый запрос
+credentials_cache = CredentialCache(
+    maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL
+)
+get_current_user = current_user_dependency(authenticate_user, credentials_cache)
+if invalidation_bus is not None:
+    invalidation_bus.subscribe("user", credentials_cache.invalidate_user)
+
+
+# Смена пароля или деактивация учетной записи сбрасывает ее записи в кэше
+@event.listens_for(User.hashed_password, "set")
+@event.listens_for(User.is_active, "set")
+def invalidate_user_credentials(target, value, oldvalue, initiator):
+    if target.username:
+        credentials_cache.invalidate_user(target.username)
+        broadcast_invalidation("user", target.username)
+
+
+# Метрики: гистограммы по маршрутам (MetricsMiddleware в create_app) и
+# запросы к БД через хуки на всех движках; None при METRICS_ENABLED=false
+metrics = Metrics() if settings.METRICS_ENABLED else None
+
+
+def pool_gauges(name, pool):
+    # У StaticPool/NullPool (in-memory SQLite) счетчиков соединений нет
+    if not hasattr(pool, "checkedout"):
+        return []
+    labels = {"engine": name}
+    return [
+        ("db_pool_size", "gauge", "Connection pool size", labels, pool.size()),
+        (
+            "db_pool_checked_out",
+            "gauge",
+            "Connections in use",
+            labels,
+            pool.checkedout(),
+        ),
+        ("db_pool_overflow", "gauge", "Overflow connections", labels, pool.overflow()),
+    ]
+
+
+def stats_gauges(prefix, stats, help_text):
+    return [
+        (f"{prefix}_{key}", "gauge", help_text, None, value)
+        for key, value in stats.items()
+        if isinstance(value, (int, float))
+    ]
+
+
+def service_gauges():
+    gauges = stats_gauges("alias_cache", alias_cache.stats(), "Alias cache")
+    gauges += stats_gauges(
+        "credentials_cache", credentials_cache.stats(), "Credentials cache"
+    )
+    gauges += stats_gauges("click_buffer", click_buffer.stats(), "Click buffer")
+    gauges += stats_gauges("sweeper", sweeper.stats(), "Background maintenance")
+    if click_store is not None:
+        gauges += stats_gauges("click_store", click_store.stats(), "Columnar clicks")
+    if alias_filter is not None:
+        gauges += stats_gauges("alias_filter", alias_filter.stats(), "Alias filter")
+    gauges += stats_gauges(
+        "password_hasher", password_hasher.stats(), "Password hashing pool"
+    )
+    gauges += stats_gauges("trending", trending.stats(), "Trending aliases")
+    if trending_exchange is not None:
+        gauges += stats_gauges(
+            "trending_exchange", trending_exchange.stats(), "Trending across workers"
+        )
+    if rate_limiter is not None:
+        gauges += stats_gauges("rate_limit", rate_limiter.stats(), "Rate limiting")
+    engines = {
+        "primary": engine,
+        "replica": read_engine,
+        "async_primary": async_engine.sync_engine,
+        "async_replica": async_read_engine.sync_engine,
+    }
+    seen = set()
+    for name, bound in engines.items():
+        if bound not in seen:
+            seen.add(bound)
+            gauges += pool_gauges(name, bound.pool)
+    return gauges
 
 
-@app.get("/")
-def read_root():
+if metrics is not None:
+    metrics.registry.collector(service_gauges)
+    # Реплика может совпадать с основной базой - хуки вешаются один раз
+    sync_engines = (async_engine.sync_engine, async_read_engine.sync_engine)
+    for bound in {engine, read_engine, *sync_engines}:
+        instrument_engine(bound, metrics)
+
+
+@router.get("/")
+async def read_root():
     """Корневой эндпоинт с информацией о сервисе"""
     return {
         "message": "URL Alias Service",
@@ -133,18 +822,24 @@ def read_root():
     }
 
 
-@app.post("/register/", status_code=status.HTTP_201_CREATED)
-def register_user(username: str, password: str, db: Session = Depends(get_db)):
+@router.post("/register/", status_code=status.HTTP_201_CREATED)
+async def register_user(
+    username: str, password: str, db: AsyncSession = Depends(get_async_db)
+):
     """Регистрация нового пользователя"""
-    existing_user = db.query(User).filter(User.username == username).first()
+    existing_user = await db.scalar(select(User).where(User.username == username))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    user = User(username=username, hashed_password=password)
+    try:
+        hashed_password = await password_hasher.hash(password)
+    except HasherBusy:
+        raise hasher_busy()
+    user = User(username=username, hashed_password=hashed_password)
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return {
         "message": "User created successfully",
@@ -153,130 +848,438 @@ def register_user(username: str, password: str, db: Session = Depends(get_db)):
     }
 
 
-@app.post("/urls/", status_code=status.HTTP_201_CREATED)
-def create_url(
+@router.post("/urls/", status_code=status.HTTP_201_CREATED)
+async def create_url(
     original_url: str,
-    expiration_days: int = 30,
-    db: Session = Depends(get_db),
-    credentials: HTTPBasicCredentials = Depends(security),
+    expiration_days: int = Query(30, ge=1, le=settings.MAX_EXPIRATION_DAYS),
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user),
 ):
     """Создание короткой ссылки"""
-    user = authenticate_user(db, credentials.username, credentials.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Basic"},
-        )
-
-    alias = generate_alias()
-    while db.query(URL).filter(URL.alias == alias).first():
-        alias = generate_alias()
-
-    expires_at = datetime.utcnow() + timedelta(days=expiration_days)
-
-    db_url = URL(
-        original_url=original_url, alias=alias, expires_at=expires_at, owner_id=user.id
-    )
-
-    db.add(db_url)
-    db.commit()
-    db.refresh(db_url)
+    now = datetime.utcnow()
+    row = {
+        "original_url": original_url,
+        "expires_at": now + timedelta(days=expiration_days),
+        "created_at": now,
+        "owner_id": user.id,
+    }
+    ids = await insert_urls(db, [row])
+    await db.commit()
+    announce_aliases(ids)
 
     return {
-        "id": db_url.id,
-        "original_url": db_url.original_url,
-        "alias": db_url.alias,
-        "short_url": f"http://localhost:8000/{db_url.alias}",
-        "expires_at": db_url.expires_at,
-        "created_at": db_url.created_at,
+        "id": ids[row["alias"]],
+        "original_url": row["original_url"],
+        "alias": row["alias"],
+        "short_url": f"http://localhost:8000/{row['alias']}",
+        "expires_at": row["expires_at"],
+        "created_at": row["created_at"],
     }
 
 
-@app.get("/urls/")
-def list_urls(
-    skip: int = 0,
-    limit: int = 100,
-    active_only: bool = True,
-    db: Session = Depends(get_db),
-    credentials: HTTPBasicCredentials = Depends(security),
+def body_too_large():
+    return HTTPException(status_code=413, detail="Request body too large")
+
+
+async def read_body_limited(request: Request, limit: int):
+    """Тело запроса не больше limit байт, иначе 413 (до чтения, по Content-Length)"""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise body_too_large()
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > limit:
+            raise body_too_large()
+    return bytes(body)
+
+
+async def read_ndjson_lines(request: Request, max_items: int, max_bytes: int):
+    """Непустые строки NDJSON по мере чтения тела, не больше max_items
+
+    Возвращает (строки, обрезано): на строке сверх лимита чтение
+    прекращается. Тело больше max_bytes - 413.
+    """
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise body_too_large()
+    lines = []
+    pending = b""
+    received = 0
+    async for part in request.stream():
+        received += len(part)
+        if received > max_bytes:
+            raise body_too_large()
+        *complete, pending = (pending + part).split(b"\n")
+        for line in complete:
+            if not line.strip():
+                continue
+            if len(lines) >= max_items:
+                return lines, True
+            lines.append(line)
+    if pending.strip():
+        if len(lines) >= max_items:
+            return lines, True
+        lines.append(pending)
+    return lines, False
+
+
+def parse_bulk_item(raw):
+    if isinstance(raw, bytes):
+        return BulkURLItem.model_validate_json(raw)
+    return BulkURLItem.model_validate(raw)
+
+
+def bulk_item_error(exc: ValidationError) -> str:
+    """Короткое сообщение первой ошибки, как msg в 422 POST /urls/"""
+    error = exc.errors()[0]
+    if error["type"] == "json_invalid":
+        return "Invalid JSON"
+    field = ".".join(str(part) for part in error["loc"]) or "item"
+    return f"{field}: {error['msg']}"
+
+
+# Создает пачку ссылок в одной транзакции и возвращает результат по каждой
+async def create_url_chunk(db: AsyncSession, user_id: int, chunk):
+    results = {}
+    valid = []
+    for index, raw in chunk:
+        try:
+            valid.append((index, parse_bulk_item(raw)))
+        except ValidationError as exc:
+            results[index] = {"index": index, "error": bulk_item_error(exc)}
+
+    if valid:
+        now = datetime.utcnow()
+        rows = [
+            {
+                "original_url": item.original_url,
+                "expires_at": now + timedelta(days=item.expiration_days),
+                "created_at": now,
+                "owner_id": user_id,
+            }
+            for _, item in valid
+        ]
+        try:
+            ids = await insert_urls(db, rows)
+            await db.commit()
+            announce_aliases(ids)
+        except Exception:
+            await db.rollback()
+            for index, _ in valid:
+                results[index] = {"index": index, "error": "Database error"}
+        else:
+            for (index, _), row in zip(valid, rows):
+                results[index] = {
+                    "index": index,
+                    "id": ids[row["alias"]],
+                    "original_url": row["original_url"],
+                    "alias": row["alias"],
+                    "short_url": f"http://localhost:8000/{row['alias']}",
+                    "expires_at": row["expires_at"].isoformat(),
+                    "created_at": now.isoformat(),
+                }
+
+    return [results[index] for index, _ in chunk]
+
+
+@router.post("/urls/bulk")
+async def create_urls_bulk(
+    request: Request,
+    user: AuthenticatedUser = Depends(get_current_user),
 ):
-    """Получение списка всех ссылок"""
-    user = authenticate_user(db, credentials.username, credentials.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Basic"},
+    """Массовое создание ссылок
+
+    Тело - JSON-массив или NDJSON (Content-Type: application/x-ndjson) из
+    объектов {"original_url": ..., "expiration_days": ...}. Ответ - NDJSON
+    с результатом по каждому элементу в исходном порядке.
+    """
+    # Тело читаем до начала ответа: StreamingResponse сам слушает receive().
+    # Память ограничена BULK_MAX_BYTES, NDJSON сверх BULK_MAX_ITEMS не читается
+    truncated = False
+    if "ndjson" in request.headers.get("content-type", ""):
+        items, truncated = await read_ndjson_lines(
+            request, settings.BULK_MAX_ITEMS, settings.BULK_MAX_BYTES
         )
+    else:
+        body = await read_body_limited(request, settings.BULK_MAX_BYTES)
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail="Too many items")
+
+    async def results():
+        async with async_session_scope() as db:
+            for first in range(0, len(items), settings.BULK_CHUNK_SIZE):
+                last = first + settings.BULK_CHUNK_SIZE
+                chunk = list(enumerate(items[first:last], first))
+                for result in await create_url_chunk(db, user.id, chunk):
+                    yield json.dumps(result) + "\n"
+        if truncated:
+            yield json.dumps({"index": len(items), "error": "Too many items"}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# Колонки ответа со ссылкой (поля URLList): строки читаются без ORM-объектов
+# и отдаются через orjson без jsonable_encoder и повторной валидации
+URL_LIST_COLUMNS = [
+    URL.__table__.c[name] for name in URLList.model_fields if name in URL.__table__.c
+]
+
+
+@router.get("/urls/", response_model=List[URLList], response_class=ORJSONResponse)
+async def list_urls(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    active_only: bool = True,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Получение списка всех ссылок
+
+    Следующая страница: cursor из заголовка X-Next-Cursor (skip - устаревший
+    способ, его стоимость растет с номером страницы).
+    """
+    query = user_urls_query(user.id, active_only)
+    if cursor:
+        # Keyset: страница N стоит столько же, сколько первая
+        try:
+            query = after_cursor(query, URL.created_at, URL.id, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        query = query.offset(skip)
+
+    query = query.with_only_columns(*URL_LIST_COLUMNS).limit(limit)
+    urls = [dict(row) for row in (await db.execute(query)).mappings()]
+    headers = {}
+    if len(urls) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(urls[-1]["created_at"], urls[-1]["id"])
+    return ORJSONResponse(urls, headers=headers)
+
+
+# Колонки выгрузок (/urls/export, /stats/clicks/export)
+URL_EXPORT_COLUMNS = [
+    "id",
+    "alias",
+    "original_url",
+    "is_active",
+    "created_at",
+    "expires_at",
+    "clicks_count",
+]
+CLICK_EXPORT_COLUMNS = ["alias", "clicked_at", "ip_address", "user_agent"]
+
+
+# Фильтры выгрузки ссылок: время создания и alias
+def export_urls_query(user_id, since=None, until=None, alias=None, active_only=False):
+    query = user_urls_query(user_id, active_only).with_only_columns(
+        *[URL.__table__.c[name] for name in URL_EXPORT_COLUMNS]
+    )
+    if since:
+        query = query.where(URL.created_at >= since)
+    if until:
+        query = query.where(URL.created_at < until)
+    if alias:
+        query = query.where(URL.alias == alias)
+    return query
+
+
+# Клики по ссылкам пользователя: ссылки в порядке индекса владельца, клики
+# каждой - в порядке (url_id, clicked_at). Порядок совпадает с проходом по
+# индексам, поэтому база не сортирует весь результат во временной таблице
+def export_clicks_query(user_id, since=None, until=None, alias=None):
+    query = (
+        select(URL.alias, URLClick.clicked_at, URLClick.ip_address, URLClick.user_agent)
+        .join(URL, URL.id == URLClick.url_id)
+        .where(URL.owner_id == user_id)
+        .order_by(URL.created_at, URL.id, URLClick.clicked_at)
+    )
+    if since:
+        query = query.where(URLClick.clicked_at >= since)
+    if until:
+        query = query.where(URLClick.clicked_at < until)
+    if alias:
+        query = query.where(URL.alias == alias)
+    return query
+
+
+async def store_click_partitions(db, user_id, since=None, until=None, alias=None):
+    """Пачки строк CLICK_EXPORT_COLUMNS из колоночного хранилища
+
+    Ссылки пользователя читаются из базы, клики - из сегментов (по
+    партициям, внутри сегмента по времени); чтение сегментов идет в пуле
+    потоков.
+    """
+    query = user_urls_query(user_id, active_only=False).with_only_columns(
+        URL.id, URL.alias
+    )
+    if alias:
+        query = query.where(URL.alias == alias)
+    aliases = dict((await db.execute(query)).all())
+    if not aliases:
+        return
+    clicks = click_store.clicks(since, until, aliases)
+    size = settings.EXPORT_CHUNK_SIZE
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(clicks, size)))
+        if not batch:
+            return
+        yield [
+            (
+                aliases[click.url_id],
+                click.clicked_at,
+                click.ip_address,
+                click.user_agent,
+            )
+            for click in batch
+        ]
+
+
+def export_response(query, columns, fmt, filename):
+    """StreamingResponse по запросу: своя сессия на реплике живет, пока идет ответ
+
+    query - запрос SQLAlchemy или функция db -> асинхронный итератор пачек строк.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+    async def chunks():
+        async with async_session_scope(read_only=True) as db:
+            if callable(query):
+                partitions = query(db)
+            else:
+                partitions = stream_partitions(db, query, settings.EXPORT_CHUNK_SIZE)
+            async for chunk in export_chunks(partitions, columns, fmt):
+                yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type=EXPORT_FORMATS[fmt],
+        headers=export_headers(filename, fmt),
+    )
 
-    query = db.query(URL).filter(URL.owner_id == user.id)
-    if active_only:
-        query = query.filter(URL.is_active == True)
 
-    urls = query.offset(skip).limit(limit).all()
-    return urls
+@router.get("/urls/export")
+async def export_urls(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    alias: Optional[str] = None,
+    active_only: bool = False,
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Выгрузка ссылок в NDJSON или CSV потоком, без загрузки в память"""
+    query = export_urls_query(user.id, since, until, alias, active_only)
+    return export_response(query, URL_EXPORT_COLUMNS, format, "urls")
+
+
+@router.get("/stats/clicks/export")
+async def export_clicks(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    alias: Optional[str] = None,
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Выгрузка истории кликов (alias, время, IP, User-Agent) потоком
+
+    С приемником columnar клики читаются из колоночного хранилища.
+    """
+    if click_store is not None:
+        query = partial(
+            store_click_partitions,
+            user_id=user.id,
+            since=since,
+            until=until,
+            alias=alias,
+        )
+    else:
+        query = export_clicks_query(user.id, since, until, alias)
+    return export_response(query, CLICK_EXPORT_COLUMNS, format, "clicks")
 
 
-@app.post("/urls/{url_id}/deactivate")
-def deactivate_url(
+@router.post(
+    "/urls/{url_id}/deactivate", response_model=URLList, response_class=ORJSONResponse
+)
+async def deactivate_url(
     url_id: int,
-    db: Session = Depends(get_db),
-    credentials: HTTPBasicCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user),
 ):
     """Деактивация ссылки"""
-    user = authenticate_user(db, credentials.username, credentials.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Basic"},
-        )
-
-    db_url = db.query(URL).filter(URL.id == url_id, URL.owner_id == user.id).first()
+    # Одним UPDATE ... RETURNING, без загрузки объекта URL
+    table = URL.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == url_id, table.c.owner_id == user.id)
+        .values(is_active=False)
+        .returning(*URL_LIST_COLUMNS)
+    )
+    db_url = (await db.execute(stmt)).mappings().first()
     if not db_url:
         raise HTTPException(status_code=404, detail="URL not found")
+    db_url = dict(db_url)
+    await db.commit()
+
+    # Запоминаем неактивную ссылку, а не просто сбрасываем запись: реплика
+    # может еще какое-то время отдавать строку с is_active=True
+    alias_cache.set(
+        db_url["alias"],
+        CachedURL(db_url["id"], db_url["original_url"], False, db_url["expires_at"]),
+    )
+
+    return ORJSONResponse(db_url)
 
-    db_url.is_active = False
-    db.commit()
-    db.refresh(db_url)
 
-    return db_url
+# Колонки ссылки для /stats/detailed/
+DETAILED_STATS_COLUMNS = [
+    URL.id,
+    URL.alias,
+    URL.original_url,
+    URL.clicks_count,
+    URL.created_at,
+    URL.expires_at,
+    URL.is_active,
+]
 
 
-@app.get("/stats/detailed/", response_model=List[DetailedStatsResponse])
-def get_detailed_stats(
-    db: Session = Depends(get_db), credentials: HTTPBasicCredentials = Depends(security)
+@router.get(
+    "/stats/detailed/",
+    response_model=List[DetailedStatsResponse],
+    response_class=ORJSONResponse,
+)
+async def get_detailed_stats(
+    db: AsyncSession = Depends(get_async_read_db),
+    user: AuthenticatedUser = Depends(get_current_user),
 ):
     """Получение расширенной статистики по переходам"""
-    user = authenticate_user(db, credentials.username, credentials.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Basic"},
+    query = user_urls_query(user.id, active_only=False).with_only_columns(
+        *DETAILED_STATS_COLUMNS
+    )
+    urls = (await db.execute(query)).all()
+
+    now = datetime.utcnow()
+    # Окна час и сутки бакеты покрывают целиком; сегменты читаются, только
+    # если бакеты никто не пишет (CLICK_SINKS=columnar без counters)
+    if not ROLLUPS_MAINTAINED and click_store is not None:
+        clicks_by_url = await run_in_threadpool(
+            store_click_windows, [url.id for url in urls], now
         )
-
-    urls = db.query(URL).filter(URL.owner_id == user.id).all()
+    else:
+        windows = await db.execute(click_windows_query(user.id, now))
+        clicks_by_url = {url_id: (hour, day) for url_id, hour, day in windows}
 
     detailed_stats = []
 
     for url in urls:
-        now = datetime.utcnow()
-        one_hour_ago = now - timedelta(hours=1)
-        one_day_ago = now - timedelta(days=1)
-
-        last_hour_clicks = (
-            db.query(URLClick)
-            .filter(URLClick.url_id == url.id, URLClick.clicked_at >= one_hour_ago)
-            .count()
-        )
-
-        last_day_clicks = (
-            db.query(URLClick)
-            .filter(URLClick.url_id == url.id, URLClick.clicked_at >= one_day_ago)
-            .count()
-        )
+        last_hour_clicks, last_day_clicks = clicks_by_url.get(url.id, (0, 0))
 
         short_link = f"http://localhost:8000/{url.alias}"
 
@@ -295,33 +1298,241 @@ def get_detailed_stats(
 
     detailed_stats.sort(key=lambda x: x["total_clicks"], reverse=True)
 
-    return detailed_stats
+    # Словари уже в форме DetailedStatsResponse: без повторной валидации
+    return ORJSONResponse(detailed_stats)
 
 
-@app.get("/{alias}")
-def redirect_url(alias: str, db: Session = Depends(get_db), request: Request = None):
-    """Перенаправление по короткой ссылке"""
-    db_url = db.query(URL).filter(URL.alias == alias).first()
-    if not db_url or not db_url.is_active or db_url.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=404, detail="URL not found or expired")
+def trending_top(window, limit):
+    if trending_exchange is not None:
+        return trending_exchange.top(window, limit)
+    return trending.top(window, limit)
 
-    db_url.clicks_count += 1
 
-    click = URLClick(
-        url_id=db_url.id,
-        clicked_at=datetime.utcnow(),
-        ip_address=request.client.host if request and request.client else None,
-        user_agent=request.headers.get("user-agent") if request else None,
+@router.get("/stats/trending", response_class=ORJSONResponse)
+async def get_trending(
+    window: Optional[str] = None,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_async_read_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Самые популярные ссылки пользователя за 5m, 1h и 24h
+
+    Из наброска в памяти (app/trending.py, в режиме multi - сумма по
+    воркерам), url_clicks не читается. Набросок общий для сервиса, в ответ
+    попадают только ссылки пользователя из его топ-TRENDING_CAPACITY: чужие
+    alias не раскрываются. clicks - оценка сверху, error - на сколько она
+    может быть завышена.
+    """
+    if window is not None and window not in trending.rings:
+        raise HTTPException(status_code=400, detail="Unknown window")
+    limit = max(1, min(limit, settings.TRENDING_CAPACITY))
+    names = [window] if window else list(trending.rings)
+    tops = {
+        name: await run_in_threadpool(trending_top, name, settings.TRENDING_CAPACITY)
+        for name in names
+    }
+    candidates = {alias for top in tops.values() for alias, _, _ in top}
+    owned = set()
+    if candidates:
+        query = select(URL.alias).where(
+            URL.owner_id == user.id, URL.alias.in_(candidates)
+        )
+        owned = set((await db.execute(query)).scalars())
+    return ORJSONResponse(
+        {
+            name: [
+                {"alias": alias, "clicks": clicks, "error": error}
+                for alias, clicks, error in tops[name]
+                if alias in owned
+            ][:limit]
+            for name in names
+        }
     )
 
-    db.add(click)
-    db.commit()
-    db.refresh(db_url)
 
-    return {"redirect_url": db_url.original_url}
+# Разрешение alias из кэша для быстрого пути (app/fastpath.py): только
+# попадания в кэш по активной ссылке, все остальное обрабатывает redirect_url
+def resolve_cached_redirect(alias, scope):
+    cached = alias_cache.get(alias)
+    if cached is None or not cached.is_active:
+        return None
+    now = datetime.utcnow()
+    if cached.expires_at < now:
+        return None
+
+    user_agent = None
+    for name, value in scope["headers"]:
+        if name == b"user-agent":
+            user_agent = value.decode("latin-1")
+            break
+    client = scope.get("client")
+    click_buffer.add(
+        cached.url_id,
+        now,
+        ip_address=client[0] if client else None,
+        user_agent=user_agent,
+    )
+    trending.add(alias)
+    return cached.original_url
+
+
+# Объявлен до /{alias}, иначе "metrics" ушел бы в поиск короткой ссылки
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/{alias}")
+async def redirect_url(alias: str, request: Request = None):
+    """Перенаправление по короткой ссылке
+
+    Браузеру отдается настоящий редирект; с Accept: application/json -
+    JSON {"redirect_url": ...} для клиентов API.
+    """
+    cached = alias_cache.get(alias)
+    if cached is None:
+        # Сессия открывается только для alias, которые могут существовать
+        if reject_unknown_alias(alias):
+            raise HTTPException(status_code=404, detail="URL not found or expired")
+        async with async_session_scope(read_only=True) as db:
+            row = (
+                await db.execute(
+                    select(
+                        URL.id, URL.original_url, URL.is_active, URL.expires_at
+                    ).where(URL.alias == alias)
+                )
+            ).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="URL not found or expired")
+        cached = CachedURL(*row)
+        alias_cache.set(alias, cached)
+
+    if not cached.is_active:
+        raise HTTPException(status_code=404, detail="URL not found or expired")
+    if cached.expires_at < datetime.utcnow():
+        alias_cache.invalidate(alias)
+        raise HTTPException(status_code=404, detail="URL not found or expired")
+
+    # Клик уходит в буфер, в БД он попадет пачкой
+    click_buffer.add(
+        cached.url_id,
+        datetime.utcnow(),
+        ip_address=request.client.host if request and request.client else None,
+        user_agent=request.headers.get("user-agent") if request else None,
+    )
+    trending.add(alias)
+
+    if request and wants_json(request.scope["headers"]):
+        return {"redirect_url": cached.original_url}
+    return RedirectResponse(
+        cached.original_url,
+        status_code=settings.REDIRECT_STATUS,
+        headers={"Cache-Control": settings.REDIRECT_CACHE_CONTROL},
+    )
 
 
-@app.get("/health/")
-def health_check():
+@router.get("/health/")
+async def health_check():
     """Проверка здоровья сервиса"""
     return {"status": "healthy"}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Проверка схемы - в пуле потоков, чтобы не блокировать цикл событий
+    await run_in_threadpool(ensure_schema)
+    await run_in_threadpool(rebuild_alias_filter, True)
+    if invalidation_bus is not None:
+        invalidation_bus.start()
+    if trending_exchange is not None:
+        trending_exchange.start()
+    sweeper.start()
+    try:
+        yield
+    finally:
+        sweeper.stop()
+        # Дописываем оставшиеся в буфере клики перед остановкой
+        click_buffer.stop()
+        if invalidation_bus is not None:
+            invalidation_bus.stop()
+        if trending_exchange is not None:
+            trending_exchange.stop()
+        password_hasher.shutdown()
+        await dispose_engines()
+
+
+# Для лимита на пользователя: учетные данные, уже проверенные маршрутом
+def verified_credentials(username, password):
+    return credentials_cache.peek(credentials_digest(username, password)) is not None
+
+
+def rate_limit_rules(reserved):
+    # GET /<alias> - один сегмент пути, кроме первых сегментов маршрутов (/metrics)
+    skip = "|".join(re.escape(path) for path in reserved)
+    alias_path = rf"^/(?!(?:{skip})$)[^/]+$" if skip else r"^/[^/]+$"
+    return [
+        make_rule(
+            create_url, "POST", r"^/urls/$", settings.RATE_LIMIT_CREATE, per_user=True
+        ),
+        make_rule(
+            create_urls_bulk,
+            "POST",
+            r"^/urls/bulk$",
+            settings.RATE_LIMIT_BULK,
+            per_user=True,
+        ),
+        make_rule(register_user, "POST", r"^/register/$", settings.RATE_LIMIT_REGISTER),
+        make_rule(redirect_url, "GET", alias_path, settings.RATE_LIMIT_REDIRECT),
+    ]
+
+
+def create_app():
+    """Фабрика приложения: uvicorn --factory app.simple_app:create_app"""
+    application = FastAPI(
+        title="URL Alias Service",
+        description="Сервис для создания коротких ссылок с расширенной статистикой",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    application.include_router(router)
+    # Первые сегменты маршрутов (metrics, docs, stats, urls и т.п.) - не alias
+    reserved = sorted(
+        {
+            route.path.split("/")[1]
+            for route in application.routes
+            if route.path.split("/")[1] and "{" not in route.path.split("/")[1]
+        }
+    )
+    application.add_middleware(
+        RedirectFastPath,
+        resolve=resolve_cached_redirect,
+        status_code=settings.REDIRECT_STATUS,
+        cache_control=settings.REDIRECT_CACHE_CONTROL,
+        reject=reject_unknown_alias if alias_filter is not None else None,
+        reserved=reserved,
+    )
+    # Лимит проверяется раньше быстрого пути: редиректы из кэша тоже считаются
+    if rate_limiter is not None:
+        application.add_middleware(
+            RateLimitMiddleware,
+            limiter=rate_limiter,
+            rules=rate_limit_rules(reserved),
+            verify=verified_credentials,
+        )
+    # Снаружи быстрого пути и лимита: их ответы (и 429) тоже попадают в метрики
+    if metrics is not None:
+        application.add_middleware(MetricsMiddleware, metrics=metrics)
+    return application
+
+
+def __getattr__(name):
+    # app.simple_app:app по-прежнему работает: приложение собирается при
+    # первом обращении, а не при импорте модуля
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,142 @@
+"""Самые популярные alias за скользящие окна (5 минут, час, сутки) без БД
+
+Каждое окно - кольцо из size корзин по step секунд, в корзине - набросок
+Space-Saving на capacity alias. Клик увеличивает счетчик в текущей корзине
+каждого окна за O(1); при заполненном наброске alias с наименьшим
+счетчиком уступает место новому, а новый наследует этот счетчик как
+погрешность. Память постоянна: capacity * (сумма size) записей при любом
+числе alias.
+
+Top-K окна - сумма счетчиков по его корзинам. Счетчик Space-Saving
+завышен не больше чем на погрешность, alias с долей кликов корзины выше
+1 / capacity в ней есть всегда; из корзин, где alias вытеснен, его клики
+(меньше минимального счетчика) не учитываются. Окно сдвигается шагом
+корзины, текущая корзина заполнена частично. Набросок считает клики
+своего процесса; при нескольких воркерах их топы складываются при запросе
+(TrendingExchange в app/shared_cache.py).
+"""
+
+import time
+
+# Имя окна -> (секунд в корзине, корзин в кольце)
+WINDOWS = {"5m": (60, 5), "1h": (300, 12), "24h": (3600, 24)}
+
+
+class SpaceSaving:
+    """Набросок Space-Saving: счетчики в корзинах по значению, add - O(1)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # key -> [счетчик, погрешность]
+        self.counts = {}
+        # значение счетчика -> ключи с ним (dict как упорядоченное множество)
+        self._by_count = {}
+        self.min_count = 0
+        self.total = 0
+
+    def _unlink(self, key, count):
+        keys = self._by_count[count]
+        del keys[key]
+        if not keys:
+            del self._by_count[count]
+            if count == self.min_count:
+                # Ключ переходит в count + 1, меньших счетчиков нет
+                self.min_count = count + 1
+
+    def add(self, key):
+        self.total += 1
+        entry = self.counts.get(key)
+        if entry is not None:
+            self._unlink(key, entry[0])
+        elif len(self.counts) < self.capacity:
+            entry = self.counts[key] = [0, 0]
+            # У нового ключа счетчик 1 - меньше не бывает
+            self.min_count = 1
+        else:
+            floor = self.min_count
+            victim = next(iter(self._by_count[floor]))
+            self._unlink(victim, floor)
+            del self.counts[victim]
+            entry = self.counts[key] = [floor, floor]
+        entry[0] += 1
+        self._by_count.setdefault(entry[0], {})[key] = None
+
+
+class _Ring:
+    def __init__(self, step, size, capacity):
+        self.step = step
+        self.size = size
+        self.capacity = capacity
+        # [номер корзины от начала эпохи, SpaceSaving]
+        self.slots = [[None, None] for _ in range(size)]
+
+    def add(self, key, now):
+        number = int(now // self.step)
+        slot = self.slots[number % self.size]
+        if slot[0] != number:
+            slot[0] = number
+            slot[1] = SpaceSaving(self.capacity)
+        slot[1].add(key)
+
+    def sketches(self, now):
+        number = int(now // self.step)
+        return [
+            sketch
+            for slot_number, sketch in self.slots
+            if slot_number is not None and number - self.size < slot_number <= number
+        ]
+
+
+class TrendingAliases:
+    """Top-K alias по окнам WINDOWS; add вызывается на каждый редирект"""
+
+    def __init__(self, capacity=1000, windows=None, clock=time.time):
+        self.capacity = capacity
+        self._clock = clock
+        self.rings = {
+            name: _Ring(step, size, capacity)
+            for name, (step, size) in (windows or WINDOWS).items()
+        }
+        self.clicks = 0
+
+    def add(self, alias):
+        now = self._clock()
+        for ring in self.rings.values():
+            ring.add(alias, now)
+        self.clicks += 1
+
+    def top(self, window, limit=10, extra=()):
+        """[(alias, клики, погрешность)] по убыванию кликов; KeyError - нет окна
+
+        extra - топы того же окна из других процессов (списки троек), они
+        складываются с наброском этого процесса.
+        """
+        totals = {}
+        entries = [
+            (key, count, error)
+            for sketch in self.rings[window].sketches(self._clock())
+            for key, (count, error) in sketch.counts.items()
+        ]
+        for part in [entries, *extra]:
+            for key, count, error in part:
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = [count, error]
+                else:
+                    total[0] += count
+                    total[1] += error
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:limit]]
+
+    def stats(self):
+        sketches = [
+            sketch
+            for ring in self.rings.values()
+            for _, sketch in ring.slots
+            if sketch is not None
+        ]
+        return {
+            "capacity": self.capacity,
+            "clicks": self.clicks,
+            "tracked": sum(len(sketch.counts) for sketch in sketches),
+        }
@@ -0,0 +1,150 @@
+"""Сравнение хранения сырых кликов: url_clicks в SQLite и колоночные сегменты
+
+Запуск:
+    python -m benchmarks.click_store --clicks 1000000 --days 30 --links 1000
+
+Одни и те же клики (равномерно за --days суток, несколько десятков
+User-Agent, случайные IPv4) пишутся в таблицу url_clicks с ее индексом и в
+ColumnarClickStore. Печатается размер на клик и время подсчета кликов по
+ссылкам за последние сутки и за всю историю.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+
+from app.click_store import ColumnarClickStore
+from app.clicks import Click
+from app.simple_app import URLClick
+
+USER_AGENTS = [
+    f"Mozilla/5.0 ({system}) AppleWebKit/537.36 (KHTML, like Gecko) "
+    f"{browser}/{version}.0.0.0 Safari/537.36"
+    for system in (
+        "Windows NT 10.0; Win64; x64",
+        "Macintosh; Intel Mac OS X 10_15_7",
+        "X11; Linux x86_64",
+        "Linux; Android 14; Pixel 8",
+        "iPhone; CPU iPhone OS 17_4 like Mac OS X",
+    )
+    for browser in ("Chrome", "Edg", "OPR")
+    for version in range(118, 124)
+]
+
+
+def generate(count, days, links, seed=0):
+    """Клики в порядке времени, как их пишет буфер"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    step = timedelta(days=days) / count
+    start = now - timedelta(days=days)
+    for index in range(count):
+        yield Click(
+            rng.randint(1, links),
+            start + step * index,
+            f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.1",
+            rng.choice(USER_AGENTS),
+        )
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def measure_sql(workdir, clicks, batch_size):
+    path = os.path.join(workdir, "clicks.db")
+    engine = create_engine(f"sqlite:///{path}")
+    URLClick.__table__.create(engine)
+    with engine.begin() as conn:
+        for first in range(0, len(clicks), batch_size):
+            last = first + batch_size
+            conn.execute(
+                insert(URLClick.__table__),
+                [click._asdict() for click in clicks[first:last]],
+            )
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+
+    def window(since):
+        with engine.connect() as conn:
+            return conn.execute(
+                select(URLClick.url_id, func.count())
+                .where(URLClick.clicked_at >= since)
+                .group_by(URLClick.url_id)
+            ).all()
+
+    result = {"bytes": os.path.getsize(path)}
+    now = datetime.utcnow()
+    _, result["last_day_s"] = timed(lambda: window(now - timedelta(days=1)))
+    _, result["all_s"] = timed(lambda: window(datetime(1970, 1, 1)))
+    engine.dispose()
+    return result
+
+
+def measure_columnar(workdir, clicks, batch_size, segment_rows):
+    directory = os.path.join(workdir, "store")
+    store = ColumnarClickStore(directory, max_rows=segment_rows, max_seconds=1e9)
+    for first in range(0, len(clicks), batch_size):
+        last = first + batch_size
+        store.write(clicks[first:last])
+    store.close()
+    result = {"bytes": directory_size(directory), "segments": store.segments}
+    now = datetime.utcnow()
+    since = clicks[0].clicked_at
+    _, result["last_day_s"] = timed(
+        lambda: store.window_counts(now - timedelta(days=1), now)
+    )
+    # Первый проход читает сегменты с диска, повторный - из кэша колонок
+    _, result["all_cold_s"] = timed(lambda: store.window_counts(since, now))
+    _, result["all_s"] = timed(lambda: store.window_counts(since, now))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--segment-rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    clicks = list(generate(args.clicks, args.days, args.links))
+    workdir = tempfile.mkdtemp(prefix="url-clicks-")
+    try:
+        report = {
+            "clicks": args.clicks,
+            "sql": measure_sql(workdir, clicks, args.batch_size),
+            "columnar": measure_columnar(
+                workdir, clicks, args.batch_size, args.segment_rows
+            ),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    for name in ("sql", "columnar"):
+        report[name]["bytes_per_click"] = round(report[name]["bytes"] / args.clicks, 1)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
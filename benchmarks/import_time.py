@@ -0,0 +1,102 @@
+"""Проверка холодного старта: время импорта приложения и сборки create_app()
+
+Запуск:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module app.simple_app --budget-ms 1500
+
+Импорт идет в отдельном процессе с -X importtime во временном каталоге.
+Код возврата 1, если:
+- импорт и create_app() вместе дольше бюджета;
+- при импорте подгружены модули, которым место только в ленивых ветках
+  (environs/marshmallow из load_config);
+- импорт создал файл базы (DDL или соединение с БД при импорте).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN = ("environs", "marshmallow")
+
+SCRIPT = """
+import time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+target.create_app()
+built = time.perf_counter()
+print("IMPORT_MS", (imported - started) * 1000)
+print("CREATE_APP_MS", (built - imported) * 1000)
+"""
+
+
+def parse_importtime(stderr):
+    """[(cumulative_us, module)] из вывода -X importtime"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        modules.append((int(cumulative), name.strip()))
+    return modules
+
+
+def measure(module):
+    workdir = tempfile.mkdtemp(prefix="url-import-")
+    database = os.path.join(workdir, "import.db")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{database}"
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT.format(module=module)],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f"import of {module} failed")
+    timings = {}
+    for line in process.stdout.splitlines():
+        key, _, value = line.partition(" ")
+        timings[key] = float(value)
+    return timings, parse_importtime(process.stderr), os.path.exists(database)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.simple_app")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    timings, modules, touched_db = measure(args.module)
+    total = timings["IMPORT_MS"] + timings["CREATE_APP_MS"]
+    print(f"import {args.module}: {timings['IMPORT_MS']:.0f} ms")
+    print(f"create_app(): {timings['CREATE_APP_MS']:.0f} ms")
+    print(f"top {args.top} imports by cumulative time:")
+    slowest = sorted(modules, reverse=True)[: args.top]
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"cold start {total:.0f} ms > budget {args.budget_ms:.0f} ms")
+    loaded = {name for _, name in modules}
+    for name in FORBIDDEN:
+        if name in loaded:
+            failures.append(f"{name} is imported eagerly")
+    if touched_db:
+        failures.append("database file was created at import time")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Пропускная способность проверки паролей (scrypt)
+
+Запуск:
+    python -m benchmarks.password_hash --seconds 5
+    python -m benchmarks.password_hash --workers 1 2 4 --n 16384 --n 32768
+
+Для каждого набора параметров scrypt и числа потоков пула PasswordHasher
+держит пул загруженным в течение --seconds и печатает проверок в секунду,
+в пересчете на поток и задержку одной проверки (p50/p95).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from app.passwords import HasherBusy, PasswordHasher, hash_password
+
+PASSWORD = "bench-password"
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def measure(workers, n, r, p, seconds):
+    hasher = PasswordHasher(workers=workers, queue_size=workers, n=n, r=r, p=p)
+    stored = hash_password(PASSWORD, n, r, p)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                valid, _ = await hasher.verify(stored, PASSWORD)
+            except HasherBusy:
+                await asyncio.sleep(0.001)
+                continue
+            assert valid
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    # Клиентов вдвое больше потоков: очередь пула не пустеет
+    await asyncio.gather(*(client() for _ in range(workers * 2)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    latencies.sort()
+    rate = len(latencies) / elapsed
+    return {
+        "n": n,
+        "r": r,
+        "p": p,
+        "workers": workers,
+        "verifications_per_s": round(rate, 1),
+        "per_worker_per_s": round(rate / workers, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "rejected": hasher.rejected,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="*", default=None)
+    parser.add_argument("--n", type=int, action="append", default=None)
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--p", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, cores})
+    results = [
+        asyncio.run(measure(count, n, args.r, args.p, args.seconds))
+        for n in args.n or [2**14]
+        for count in workers
+    ]
+    json.dump({"cpu_count": cores, "results": results}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
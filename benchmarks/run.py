@@ -0,0 +1,579 @@
+"""Нагрузочный бенчмарк сервиса коротких ссылок
+
+Примеры:
+    python -m benchmarks.run run --app app.simple_app:app --users 10 \\
+        --links 1000 --clicks 100000 --requests 2000 --concurrency 32
+    python -m benchmarks.run run --mode uvicorn --workers 4 --save base.json
+    python -m benchmarks.run compare benchmarks/results/base.json new.json
+
+База SQLite создается во временном каталоге (или задается пустая база через
+--database-url, например PostgreSQL) и заполняется заданным числом
+пользователей, ссылок и кликов. Приложение вызывается либо напрямую как
+ASGI-приложение в этом процессе (mode=inprocess, без сети), либо через
+запущенный uvicorn (mode=uvicorn). По каждому эндпоинту считаются
+p50/p95/p99 и пропускная способность; результат сохраняется в JSON.
+"""
+
+import argparse
+import asyncio
+import base64
+import http.client
+import importlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PASSWORD = "bench-password"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+# --- Наполнение базы -----------------------------------------------------
+
+
+def seed(users, links, clicks, click_days):
+    """Заполняет базу из DATABASE_URL, возвращает (логины, alias)"""
+    from sqlalchemy import insert, select
+
+    from app import simple_app as service
+    from app.passwords import hash_password
+
+    service.migrate()
+    db = service.SessionLocal()
+    try:
+        usernames = [f"bench{i}" for i in range(users)]
+        # Один хеш на всех: scrypt на каждого пользователя - лишние секунды
+        hashed = hash_password(
+            PASSWORD,
+            service.settings.SCRYPT_N,
+            service.settings.SCRYPT_R,
+            service.settings.SCRYPT_P,
+        )
+        db.execute(
+            insert(service.User.__table__),
+            [
+                {"username": name, "hashed_password": hashed, "is_active": True}
+                for name in usernames
+            ],
+        )
+        user_ids = list(db.scalars(select(service.User.id)))
+
+        now = datetime.utcnow()
+        aliases = asyncio.run(service.alias_allocator.allocate(links))
+        db.execute(
+            insert(service.URL.__table__),
+            [
+                {
+                    "original_url": f"https://example.com/{i}",
+                    "alias": alias,
+                    "is_active": True,
+                    "created_at": now - timedelta(seconds=links - i),
+                    "expires_at": now + timedelta(days=30),
+                    "clicks_count": 0,
+                    "owner_id": user_ids[i % len(user_ids)],
+                }
+                for i, alias in enumerate(aliases)
+            ],
+        )
+        db.commit()
+        url_ids = list(db.scalars(select(service.URL.id)))
+    finally:
+        db.close()
+
+    # Клики пишем тем же путем, что и сервис: пачками через write_clicks
+    span = click_days * 86400
+    batch = []
+    for _ in range(clicks):
+        batch.append(
+            service.Click(
+                random.choice(url_ids),
+                now - timedelta(seconds=random.random() * span),
+                "127.0.0.1",
+                "bench",
+            )
+        )
+        if len(batch) >= 10000:
+            service.write_clicks(batch)
+            batch = []
+    if batch:
+        service.write_clicks(batch)
+
+    return usernames, aliases
+
+
+# --- Клиенты -------------------------------------------------------------
+
+
+class ASGIClient:
+    """Минимальный HTTP-клиент, вызывающий ASGI-приложение напрямую"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan = None
+        self._lifespan_queue = None
+
+    async def startup(self):
+        self._lifespan_queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            return await self._lifespan_queue.get()
+
+        async def send(message):
+            if message["type"].startswith("lifespan.startup") and not started.done():
+                started.set_result(message)
+
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan = asyncio.ensure_future(self.app(scope, receive, send))
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        await started
+
+    async def shutdown(self):
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await self._lifespan
+
+    async def request(self, method, path, params=None, headers=None):
+        query = urlencode(params or {}).encode()
+        raw_headers = [(b"host", b"bench")]
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query,
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        sent = False
+        status = 0
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await self.app(scope, receive, send)
+        return status
+
+
+class HTTPClient:
+    """Клиент к запущенному серверу; одно keep-alive соединение на поток"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method, path, params=None, headers=None):
+        url = path + ("?" + urlencode(params) if params else "")
+        conn = self._connection()
+        try:
+            conn.request(method, url, headers=headers or {})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            return 0
+
+
+# --- Сценарии ------------------------------------------------------------
+
+
+def basic_auth(username):
+    token = base64.b64encode(f"{username}:{PASSWORD}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+def zipf_picker(items, exponent=1.1):
+    """Выбор элементов по степенному закону: немногие alias получают почти всё"""
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(len(items))]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    def pick():
+        return random.choices(items, cum_weights=cumulative)[0]
+
+    return pick
+
+
+def build_scenarios(usernames, aliases):
+    pick_alias = zipf_picker(aliases)
+    counter = iter(range(10**12))
+
+    def redirect():
+        return "GET", f"/{pick_alias()}", None, None
+
+    def create_url():
+        username = random.choice(usernames)
+        params = {"original_url": f"https://example.com/new/{next(counter)}"}
+        return "POST", "/urls/", params, basic_auth(username)
+
+    def list_urls():
+        return "GET", "/urls/", {"limit": 100}, basic_auth(random.choice(usernames))
+
+    def detailed_stats():
+        return "GET", "/stats/detailed/", None, basic_auth(random.choice(usernames))
+
+    return {
+        "redirect": redirect,
+        "create_url": create_url,
+        "list_urls": list_urls,
+        "detailed_stats": detailed_stats,
+    }
+
+
+async def drive_inprocess(client, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, path, params, headers = make_request()
+            started = time.perf_counter()
+            status = await client.request(method, path, params, headers)
+            latencies.append(time.perf_counter() - started)
+            if not 200 <= status < 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def drive_http(client, make_request, total, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            method, path, params, headers = make_request()
+            started = time.perf_counter()
+            status = client.request(method, path, params, headers)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not 200 <= status < 400:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def load_app(target):
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "app")
+
+
+def check_app(target):
+    """Падает сразу, если приложение не из app.simple_app
+
+    seed наполняет базу по схеме app.simple_app, поэтому поддерживаются
+    только его приложение (app.simple_app:app, app.main:app) и обертки над
+    ним; на других моделях нагрузка дала бы одни ошибки.
+    """
+    from app import simple_app
+
+    application = load_app(target)
+    routes = getattr(application, "routes", ())
+    endpoints = {getattr(route, "endpoint", None) for route in routes}
+    if simple_app.redirect_url not in endpoints:
+        raise SystemExit(
+            f"--app {target}: the benchmark seeds the app.simple_app schema "
+            "and only drives apps built by app.simple_app.create_app"
+        )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(target, workers, env):
+    port = free_port()
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        target,
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+    process = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health/")
+            if conn.getresponse().status == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+def sqlite_settings():
+    """Фактические PRAGMA соединения из пула приложения"""
+    from sqlalchemy import text
+
+    from app.database import engine
+
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as conn:
+        return {
+            name: conn.execute(text(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "mmap_size", "cache_size")
+        }
+
+
+def git_revision():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="url-bench-")
+    database = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = database
+    if args.replica_url:
+        # primary - та же база через отдельный пул чтения (замена реплики)
+        replica = database if args.replica_url == "primary" else args.replica_url
+        os.environ["DATABASE_REPLICA_URL"] = replica
+    if args.sqlite_profile:
+        os.environ["SQLITE_PROFILE"] = args.sqlite_profile
+    # Нагрузка идет от одного клиента: лимит частоты отвечал бы 429
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    check_app(args.app)
+
+    started = time.perf_counter()
+    usernames, aliases = seed(args.users, args.links, args.clicks, args.click_days)
+    seed_seconds = time.perf_counter() - started
+    print(
+        f"seeded {args.users} users, {args.links} links, {args.clicks} clicks "
+        f"in {seed_seconds:.1f}s ({database})"
+    )
+
+    scenarios = build_scenarios(usernames, aliases)
+    selected = args.endpoints or list(scenarios)
+    results = {}
+
+    if args.mode == "inprocess":
+        client = ASGIClient(load_app(args.app))
+
+        async def main():
+            await client.startup()
+            try:
+                for name in selected:
+                    results[name] = await drive_inprocess(
+                        client, scenarios[name], args.requests, args.concurrency
+                    )
+                    print(name, results[name])
+            finally:
+                await client.shutdown()
+
+        asyncio.run(main())
+    else:
+        env = dict(os.environ)
+        if args.workers > 1:
+            # Общий кэш alias между воркерами, отдельный на каждый прогон
+            env.setdefault("WORKER_MODE", "multi")
+            env.setdefault("SHARED_CACHE_PATH", os.path.join(workdir, "alias-cache"))
+            env.setdefault("INVALIDATION_DIR", os.path.join(workdir, "invalidation"))
+        process, port = start_uvicorn(args.app, args.workers, env)
+        try:
+            client = HTTPClient("127.0.0.1", port)
+            for name in selected:
+                results[name] = drive_http(
+                    client, scenarios[name], args.requests, args.concurrency
+                )
+                print(name, results[name])
+        finally:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {
+            key: value for key, value in vars(args).items() if key not in ("func",)
+        },
+        "seed_seconds": round(seed_seconds, 2),
+        "sqlite": sqlite_settings(),
+        "endpoints": results,
+    }
+    save(report, args.save)
+
+
+def save(report, name):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    if name is None:
+        stamp = report["timestamp"].replace(":", "").replace("-", "")
+        name = f"{stamp}-{report['revision'] or 'local'}.json"
+    path = name if os.path.dirname(name) else os.path.join(RESULTS_DIR, name)
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"saved {path}")
+
+
+def compare(args):
+    """Сравнение двух прогонов; код 1, если p95 вырос больше допуска"""
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+
+    regressions = 0
+    header = (
+        f"{'endpoint':<16}{'metric':<16}{'baseline':>12}{'candidate':>12}{'change':>10}"
+    )
+    print(header)
+    for name, new in candidate["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old is None:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            before, after = old[metric], new[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:<16}{metric:<16}{before:>12}{after:>12}{change:>9.1f}%")
+        if old["p95_ms"] and new["p95_ms"] > old["p95_ms"] * (1 + args.tolerance):
+            regressions += 1
+            print(f"  regression: {name} p95 worse than {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="наполнить базу и прогнать нагрузку")
+    run_parser.add_argument(
+        "--app",
+        default="app.simple_app:app",
+        help="приложение из app.simple_app.create_app (app.main:app - то же самое)",
+    )
+    run_parser.add_argument(
+        "--mode", choices=("inprocess", "uvicorn"), default="inprocess"
+    )
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--users", type=int, default=10)
+    run_parser.add_argument("--links", type=int, default=1000)
+    run_parser.add_argument("--clicks", type=int, default=10000)
+    run_parser.add_argument("--click-days", type=float, default=2.0)
+    run_parser.add_argument("--requests", type=int, default=1000)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument(
+        "--endpoints",
+        nargs="*",
+        choices=("redirect", "create_url", "list_urls", "detailed_stats"),
+    )
+    run_parser.add_argument(
+        "--database-url",
+        help="основная база (по умолчанию временная SQLite), напр. postgresql://...",
+    )
+    run_parser.add_argument(
+        "--replica-url",
+        help="реплика для редиректов и статистики; primary - основная база",
+    )
+    run_parser.add_argument(
+        "--sqlite-profile",
+        choices=("tuned", "default"),
+        help="профиль SQLite (SQLITE_PROFILE) для сравнения прогонов",
+    )
+    run_parser.add_argument("--save", help="имя файла результата в benchmarks/results")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="сравнить два прогона")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--tolerance", type=float, default=0.10)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,118 @@
+"""Стоимость строки при отдаче списка ссылок: ORM + jsonable_encoder и
+колонки + orjson
+
+Запуск:
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+
+Страница из --rows ссылок одного пользователя (как GET /urls/ с
+limit=--rows) читается из SQLite в памяти и сериализуется тремя способами:
+- orm_encoder - объекты URL и jsonable_encoder + json.dumps (как было);
+- orm_pydantic - объекты URL через List[URLList] (response_model);
+- columns_orjson - select() по колонкам URLList и orjson (как сейчас).
+Печатается лучшее время из --repeat прогонов на строку, отдельно чтение
+из базы и сериализация.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.schemas import URLList
+from app.simple_app import URL, URL_LIST_COLUMNS, Base, user_urls_query
+
+
+def seed(engine, rows):
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(URL.__table__),
+            [
+                {
+                    "original_url": f"https://example.com/articles/{index}",
+                    "alias": f"a{index:07d}",
+                    "is_active": True,
+                    "created_at": now - timedelta(seconds=index),
+                    "expires_at": now + timedelta(days=30),
+                    "clicks_count": index % 1000,
+                    "owner_id": 1,
+                }
+                for index in range(rows)
+            ],
+        )
+
+
+def load_objects(engine, rows):
+    with Session(engine) as session:
+        return session.scalars(user_urls_query(1).limit(rows)).all()
+
+
+def load_columns(engine, rows):
+    query = user_urls_query(1).with_only_columns(*URL_LIST_COLUMNS).limit(rows)
+    with engine.connect() as conn:
+        return [dict(row) for row in conn.execute(query).mappings()]
+
+
+URL_LIST = TypeAdapter(List[URLList])
+
+METHODS = {
+    "orm_encoder": (
+        load_objects,
+        lambda urls: json.dumps(jsonable_encoder(urls)).encode(),
+    ),
+    "orm_pydantic": (
+        load_objects,
+        lambda urls: URL_LIST.dump_json(URL_LIST.validate_python(urls)),
+    ),
+    "columns_orjson": (load_columns, orjson.dumps),
+}
+
+
+def best(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    seed(engine, args.rows)
+    results = {}
+    for name, (load, dump) in METHODS.items():
+        rows, load_s = best(lambda: load(engine, args.rows), args.repeat)
+        body, dump_s = best(lambda: dump(rows), args.repeat)
+        results[name] = {
+            "load_us_per_row": round(load_s / len(rows) * 1e6, 2),
+            "dump_us_per_row": round(dump_s / len(rows) * 1e6, 2),
+            "total_ms": round((load_s + dump_s) * 1000, 1),
+            "bytes": len(body),
+        }
+    json.dump({"rows": args.rows, "results": results}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.aliases import ALPHABET, CounterAllocator, make_allocator
+
+
+class ScriptedAllocator:
+    """Выдает alias из заранее заданных пачек: по одной на вызов allocate"""
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.calls = []
+
+    async def allocate(self, count):
+        self.calls.append(count)
+        return self.batches.pop(0)[:count]
+
+
+def unique_alias():
+    return uuid.uuid4().hex[:8]
+
+
+def test_random_allocator_uses_alphabet_and_length():
+    allocator = make_allocator("random", engine=None, length=6)
+
+    aliases = asyncio.run(allocator.allocate(500))
+
+    assert len(aliases) == 500
+    assert all(len(alias) == 6 for alias in aliases)
+    assert set("".join(aliases)) <= set(ALPHABET)
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        make_allocator("sequential", engine=None)
+
+
+def test_counter_permutation_is_a_bijection():
+    allocator = CounterAllocator(engine=None, length=2)
+    allocator._key = b"k" * 32
+
+    values = {allocator.permute(number) for number in range(allocator.space)}
+
+    assert values == set(range(allocator.space))
+
+
+def test_counter_allocator_never_repeats_across_blocks(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'counter.db'}")
+    first = CounterAllocator(engine, length=4, block_size=7)
+    second = CounterAllocator(engine, length=4, block_size=7)
+
+    async def allocate():
+        return (
+            await first.allocate(10)
+            + await second.allocate(10)
+            + await first.allocate(5)
+        )
+
+    aliases = asyncio.run(allocate())
+
+    assert len(set(aliases)) == 25
+    assert all(len(alias) == 4 for alias in aliases)
+
+
+def test_taken_alias_is_reallocated(client, auth, app_module, monkeypatch):
+    taken = client.post(
+        "/urls/", params={"original_url": "https://example.com/a"}, headers=auth
+    ).json()["alias"]
+    fresh = unique_alias()
+    allocator = ScriptedAllocator([taken], [fresh])
+    monkeypatch.setattr(app_module, "alias_allocator", allocator)
+
+    response = client.post(
+        "/urls/", params={"original_url": "https://example.com/b"}, headers=auth
+    )
+
+    assert response.status_code == 201
+    assert response.json()["alias"] == fresh
+    assert allocator.calls == [1, 1]
+
+
+def test_duplicate_alias_within_batch_is_reallocated(
+    client, auth, app_module, monkeypatch
+):
+    duplicate, fresh = unique_alias(), unique_alias()
+    allocator = ScriptedAllocator([duplicate, duplicate], [fresh])
+    monkeypatch.setattr(app_module, "alias_allocator", allocator)
+
+    response = client.post(
+        "/urls/bulk",
+        json=[
+            {"original_url": "https://example.com/1"},
+            {"original_url": "https://example.com/2"},
+        ],
+        headers=auth,
+    )
+
+    aliases = [item["alias"] for item in map(json.loads, response.text.splitlines())]
+    assert aliases == [duplicate, fresh]
+    assert allocator.calls == [2, 1]
+
+
+def test_gives_up_after_max_attempts(client, auth, app_module, monkeypatch):
+    taken = client.post(
+        "/urls/", params={"original_url": "https://example.com/c"}, headers=auth
+    ).json()["alias"]
+    attempts = app_module.settings.ALIAS_MAX_ATTEMPTS
+    allocator = ScriptedAllocator(*[[taken]] * attempts)
+    monkeypatch.setattr(app_module, "alias_allocator", allocator)
+
+    response = client.post(
+        "/urls/", params={"original_url": "https://example.com/d"}, headers=auth
+    )
+
+    assert response.status_code == 503
+    assert len(allocator.calls) == attempts
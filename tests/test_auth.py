@@ -0,0 +1,72 @@
+import base64
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.auth import AuthenticatedUser, CredentialCache, credentials_digest
+
+
+def credentials(headers):
+    token = headers["Authorization"].split()[1]
+    return base64.b64decode(token).decode().split(":", 1)
+
+
+def test_digest_depends_on_username_and_password():
+    assert credentials_digest("a", "b") == credentials_digest("a", "b")
+    assert credentials_digest("a", "b") != credentials_digest("a", "c")
+    assert credentials_digest("a:b", "c") != credentials_digest("a", "b")
+    assert "secret" not in credentials_digest("user", "secret")
+
+
+def test_invalidate_user_drops_only_that_user():
+    cache = CredentialCache(maxsize=10, ttl=60)
+    cache.set("k1", AuthenticatedUser(1, "alice"))
+    cache.set("k2", AuthenticatedUser(1, "alice"))
+    cache.set("k3", AuthenticatedUser(2, "bob"))
+
+    cache.invalidate_user("alice")
+
+    assert cache.get("k1") is None
+    assert cache.get("k2") is None
+    assert cache.get("k3") == AuthenticatedUser(2, "bob")
+
+
+def test_verified_credentials_skip_password_check(
+    client, auth, app_module, monkeypatch
+):
+    username, password = credentials(auth)
+    assert not app_module.verified_credentials(username, password)
+    assert client.get("/urls/", headers=auth).status_code == 200
+    assert app_module.verified_credentials(username, password)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("scrypt on a cached request")
+
+    monkeypatch.setattr(app_module.password_hasher, "verify", fail)
+
+    assert client.get("/urls/", headers=auth).status_code == 200
+
+
+def test_wrong_password_is_rejected_and_not_cached(client, auth, app_module):
+    username, _ = credentials(auth)
+    token = base64.b64encode(f"{username}:wrong".encode()).decode()
+
+    response = client.get("/urls/", headers={"Authorization": f"Basic {token}"})
+
+    assert response.status_code == 401
+    assert not app_module.verified_credentials(username, "wrong")
+
+
+def test_deactivation_invalidates_cached_credentials(client, auth, app_module):
+    username, password = credentials(auth)
+    assert client.get("/urls/", headers=auth).status_code == 200
+
+    with Session(app_module.engine) as session:
+        user = session.scalar(
+            select(app_module.User).where(app_module.User.username == username)
+        )
+        user.is_active = False
+        session.commit()
+
+    assert not app_module.verified_credentials(username, password)
+    assert client.get("/urls/", headers=auth).status_code == 401
@@ -0,0 +1,55 @@
+from app.bloom import AliasFilter, BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    aliases = [f"alias-{index}" for index in range(5000)]
+    for alias in aliases:
+        bloom.add(alias)
+
+    assert all(alias in bloom for alias in aliases)
+
+
+def test_bloom_filter_false_positive_rate_is_close_to_target():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for index in range(5000):
+        bloom.add(f"alias-{index}")
+
+    unknown = [f"unknown-{index}" for index in range(20000)]
+    rate = sum(alias in bloom for alias in unknown) / len(unknown)
+
+    assert rate < 0.02
+
+
+def test_alias_filter_passes_everything_until_built():
+    alias_filter = AliasFilter(capacity=100)
+
+    assert alias_filter.might_contain("anything")
+    assert alias_filter.age() is None
+    assert alias_filter.stats()["checked"] == 0
+
+
+def test_alias_filter_rejects_unknown_after_rebuild():
+    alias_filter = AliasFilter(capacity=100, error_rate=0.001)
+    alias_filter.rebuild(iter(["abc", "def"]), count=2)
+    alias_filter.update(["ghi"])
+
+    assert all(alias_filter.might_contain(alias) for alias in ["abc", "def", "ghi"])
+    assert not alias_filter.might_contain("wp-login.php")
+    assert alias_filter.stats()["rejected"] == 1
+    assert alias_filter.stats()["items"] == 3
+
+
+def test_aliases_added_during_rebuild_are_kept():
+    alias_filter = AliasFilter(capacity=100)
+
+    def aliases():
+        yield "old"
+        # Вставка, закоммиченная, пока пересборка читает таблицу
+        alias_filter.add("new")
+
+    alias_filter.rebuild(aliases(), count=1)
+
+    assert alias_filter.might_contain("old")
+    assert alias_filter.might_contain("new")
+    assert alias_filter.rebuilds == 1
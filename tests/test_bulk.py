@@ -0,0 +1,67 @@
+import json
+
+from app.config import settings
+
+
+def post_ndjson(client, auth, lines):
+    body = "".join(line + "\n" for line in lines)
+    return client.post(
+        "/urls/bulk",
+        content=body,
+        headers={**auth, "Content-Type": "application/x-ndjson"},
+    )
+
+
+def results(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_bulk_reports_short_errors_per_item(client, auth):
+    response = post_ndjson(
+        client,
+        auth,
+        [
+            '{"original_url": "https://example.com/1"}',
+            '{"original_url": "https://example.com/2", "expiration_days": 0}',
+            "{not json",
+            '{"expiration_days": 5}',
+        ],
+    )
+
+    assert response.status_code == 200
+    items = results(response)
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+    assert "alias" in items[0]
+    assert items[1]["error"] == (
+        "expiration_days: Input should be greater than or equal to 1"
+    )
+    assert items[2]["error"] == "Invalid JSON"
+    assert items[3]["error"] == "original_url: Field required"
+
+
+def test_bulk_ndjson_stops_at_item_limit(client, auth, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+    lines = ['{"original_url": "https://example.com/%d"}' % n for n in range(5)]
+
+    items = results(post_ndjson(client, auth, lines))
+
+    assert [item.get("error") for item in items] == [None, None, "Too many items"]
+    assert items[2]["index"] == 2
+
+
+def test_bulk_json_array_over_item_limit_is_rejected(client, auth, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+    body = [{"original_url": "https://example.com/"}] * 3
+
+    response = client.post("/urls/bulk", json=body, headers=auth)
+
+    assert response.status_code == 413
+
+
+def test_bulk_body_over_byte_limit_is_rejected(client, auth, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_BYTES", 100)
+    lines = ['{"original_url": "https://example.com/%d"}' % n for n in range(10)]
+
+    assert post_ndjson(client, auth, lines).status_code == 413
+    body = [{"original_url": "https://example.com/"}] * 10
+    assert client.post("/urls/bulk", json=body, headers=auth).status_code == 413
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from app import cache
+from app.cache import CachedURL, TTLCache
+
+EXPIRES_AT = datetime(2100, 1, 1)
+
+
+def cached(url_id, active=True):
+    return CachedURL(url_id, f"https://example.com/{url_id}", active, EXPIRES_AT)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    aliases = TTLCache(maxsize=10, ttl=60)
+    aliases.set("a", cached(1))
+
+    now[0] += 59
+    assert aliases.get("a") == cached(1)
+    now[0] += 2
+    assert aliases.get("a") is None
+    assert aliases.stats()["hits"] == 1
+    assert aliases.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    aliases = TTLCache(maxsize=2)
+    aliases.set("a", cached(1))
+    aliases.set("b", cached(2))
+    aliases.get("a")
+    aliases.set("c", cached(3))
+
+    assert aliases.get("b") is None
+    assert aliases.get("a") == cached(1)
+    assert aliases.stats()["evictions"] == 1
+
+
+def test_peek_does_not_touch_counters_or_order():
+    aliases = TTLCache(maxsize=2)
+    aliases.set("a", cached(1))
+    aliases.set("b", cached(2))
+
+    assert aliases.peek("a") == cached(1)
+    aliases.set("c", cached(3))
+
+    assert aliases.peek("a") is None
+    assert aliases.stats()["hits"] == 0
+
+
+def test_invalidate_and_invalidate_matching():
+    aliases = TTLCache()
+    for url_id in range(4):
+        aliases.set(f"a{url_id}", cached(url_id))
+
+    aliases.invalidate("a0")
+    removed = aliases.invalidate_matching(lambda value: value.url_id % 2)
+
+    assert removed == 2
+    assert [aliases.get(f"a{url_id}") for url_id in range(4)] == [
+        None,
+        None,
+        cached(2),
+        None,
+    ]
+    assert aliases.stats()["invalidations"] == 3
+
+
+def test_deactivated_link_stops_redirecting(app_module, client, auth, replicate):
+    created = client.post(
+        "/urls/", params={"original_url": "https://example.com/d"}, headers=auth
+    ).json()
+    replicate(created["alias"])
+    assert client.get(f"/{created['alias']}", follow_redirects=False).status_code == 302
+    assert app_module.alias_cache.peek(created["alias"]) is not None
+
+    response = client.post(f"/urls/{created['id']}/deactivate", headers=auth)
+
+    assert response.status_code == 200
+    # Реплика еще отдает ссылку активной, но кэш помнит деактивацию
+    assert client.get(f"/{created['alias']}", follow_redirects=False).status_code == 404
@@ -0,0 +1,114 @@
+import json
+import os
+from datetime import datetime
+
+from app.click_sinks import BrokerSink, FunctionSink, LocalBroker, NdjsonSegmentSink
+from app.clicks import Click, ClickBuffer
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+class FlakySink:
+    name = "flaky"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.batches = []
+
+    def write(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("sink is down")
+        self.batches.append(list(batch))
+
+    def close(self):
+        pass
+
+
+def test_failed_batch_is_retried_without_blocking_other_sinks():
+    flaky = FlakySink(failures=1)
+    healthy = []
+    buffer = ClickBuffer(
+        [flaky, FunctionSink("healthy", healthy.append)], interval=3600
+    )
+    buffer.add(1, NOW)
+    buffer.flush()
+    buffer.add(2, NOW)
+    buffer.flush()
+    buffer.stop()
+
+    assert [[click.url_id for click in batch] for batch in flaky.batches] == [[1, 2]]
+    assert [[click.url_id for click in batch] for batch in healthy] == [[1], [2]]
+    stats = buffer.stats()
+    assert stats["flaky_errors"] == 1
+    assert stats["flaky_retrying"] == 0
+
+
+def test_retry_backlog_is_capped_at_max_pending():
+    flaky = FlakySink(failures=10)
+    buffer = ClickBuffer([flaky], interval=3600, max_pending=2)
+    for url_id in range(3):
+        buffer.add(url_id, NOW)
+        buffer.flush()
+
+    assert buffer.stats()["flaky_retrying"] == 2
+    assert buffer.stats()["flaky_dropped"] == 1
+    buffer.stop()
+
+
+def test_overflow_drop_new_keeps_queued_clicks():
+    batches = []
+    buffer = ClickBuffer(
+        [FunctionSink("memory", batches.append)],
+        max_size=10,
+        interval=3600,
+        max_pending=2,
+        overflow="drop_new",
+    )
+    assert [buffer.add(url_id, NOW) for url_id in range(3)] == [True, True, False]
+    buffer.stop()
+
+    assert [click.url_id for click in batches[0]] == [0, 1]
+    assert buffer.stats()["dropped"] == 1
+
+
+def test_overflow_drop_oldest_keeps_newest_clicks():
+    batches = []
+    buffer = ClickBuffer(
+        [FunctionSink("memory", batches.append)],
+        max_size=10,
+        interval=3600,
+        max_pending=2,
+        overflow="drop_oldest",
+    )
+    for url_id in range(3):
+        buffer.add(url_id, NOW)
+    buffer.stop()
+
+    assert [click.url_id for click in batches[0]] == [1, 2]
+
+
+def test_ndjson_segments_are_renamed_when_closed(tmp_path):
+    sink = NdjsonSegmentSink(str(tmp_path), max_rows=2)
+    sink.write([Click(1, NOW, "10.0.0.1", "agent")])
+    assert [name.endswith(".part") for name in os.listdir(tmp_path)] == [True]
+
+    sink.write([Click(2, NOW, None, None)])
+
+    (name,) = os.listdir(tmp_path)
+    assert name.endswith(".ndjson")
+    lines = (tmp_path / name).read_text().splitlines()
+    assert [json.loads(line)["url_id"] for line in lines] == [1, 2]
+
+
+def test_broker_sink_publishes_one_message_per_click():
+    broker = LocalBroker(retention=2)
+    sink = BrokerSink(broker)
+    sink.write([Click(url_id, NOW, None, "a b") for url_id in range(3)])
+
+    messages, offset = broker.consume("clicks")
+
+    assert offset == 3
+    # Хранятся последние retention сообщений
+    assert [number for number, _ in messages] == [1, 2]
+    assert json.loads(messages[0][1])["user_agent"] == "a b"
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app.click_store import ColumnarClickStore
+from app.clicks import Click
+
+
+def make_clicks(url_id, start, count, step=timedelta(minutes=1)):
+    return [
+        Click(url_id, start + step * index, "10.0.0.1", "agent")
+        for index in range(count)
+    ]
+
+
+def test_clicks_include_closed_and_open_segments(tmp_path):
+    store = ColumnarClickStore(str(tmp_path))
+    now = datetime.utcnow().replace(microsecond=0)
+    store.write(make_clicks(1, now - timedelta(days=3), 2))
+    store.close()
+    store.write(make_clicks(2, now - timedelta(minutes=5), 3))
+
+    clicks = list(store.clicks())
+    assert [click.url_id for click in clicks] == [1, 1, 2, 2, 2]
+    assert clicks[0].ip_address == "10.0.0.1"
+    assert clicks[0].user_agent == "agent"
+    assert [click.url_id for click in store.clicks(url_ids=[2])] == [2, 2, 2]
+    recent = store.clicks(since=now - timedelta(hours=1))
+    assert [click.url_id for click in recent] == [2, 2, 2]
+
+
+def test_stats_and_export_read_columnar_store(
+    app_module, client, auth, replicate, tmp_path, monkeypatch
+):
+    store = ColumnarClickStore(str(tmp_path))
+    monkeypatch.setattr(app_module, "click_store", store)
+    # Только columnar: бакеты статистики никто не пишет
+    monkeypatch.setattr(app_module, "ROLLUPS_MAINTAINED", False)
+    created = client.post(
+        "/urls/", params={"original_url": "https://example.com/c"}, headers=auth
+    ).json()
+    now = datetime.utcnow()
+    store.write(make_clicks(created["id"], now - timedelta(hours=3), 2))
+    store.write(make_clicks(created["id"], now - timedelta(minutes=10), 3))
+
+    replicate(created["alias"])
+
+    stats = client.get("/stats/detailed/", headers=auth).json()
+    assert [(s["last_hour_clicks"], s["last_day_clicks"]) for s in stats] == [(3, 5)]
+
+    export = client.get("/stats/clicks/export", headers=auth)
+    assert export.status_code == 200
+    lines = export.text.splitlines()
+    assert len(lines) == 5
+    assert all(created["alias"] in line for line in lines)
+
+
+def test_stats_use_rollups_when_they_are_maintained(
+    app_module, client, auth, tmp_path, monkeypatch
+):
+    store = ColumnarClickStore(str(tmp_path))
+    monkeypatch.setattr(app_module, "click_store", store)
+    monkeypatch.setattr(app_module, "ROLLUPS_MAINTAINED", True)
+
+    def full_scan(*args, **kwargs):
+        raise AssertionError("segments scanned although rollups cover the window")
+
+    monkeypatch.setattr(store, "window_counts", full_scan)
+
+    assert client.get("/stats/detailed/", headers=auth).status_code == 200
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.click_sinks import FunctionSink
+from app.clicks import ClickBuffer
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+def make_buffer(sink, **options):
+    # Без фонового сброса по таймеру: тест сбрасывает сам
+    options.setdefault("interval", 3600)
+    options.setdefault("max_size", 1000)
+    return ClickBuffer([sink], **options)
+
+
+def test_flush_writes_queued_clicks_as_one_batch():
+    batches = []
+    buffer = make_buffer(FunctionSink("memory", batches.append))
+    for url_id in (1, 2, 1):
+        buffer.add(url_id, NOW, ip_address="10.0.0.1")
+
+    assert buffer.flush() == 3
+    assert buffer.flush() == 0
+    buffer.stop()
+
+    assert len(batches) == 1
+    assert [click.url_id for click in batches[0]] == [1, 2, 1]
+    assert buffer.stats()["memory_written"] == 3
+
+
+def test_stop_flushes_remaining_clicks():
+    batches = []
+    buffer = make_buffer(FunctionSink("memory", batches.append))
+    buffer.add(1, NOW)
+
+    buffer.stop()
+
+    assert [len(batch) for batch in batches] == [1]
+
+
+def test_full_batch_wakes_the_background_flush():
+    batches = []
+    buffer = make_buffer(FunctionSink("memory", batches.append), max_size=2)
+    buffer.add(1, NOW)
+    buffer.add(2, NOW)
+
+    buffer.stop()
+
+    assert sum(len(batch) for batch in batches) == 2
+
+
+def test_sql_sink_updates_click_counters(app_module, client, auth):
+    created = client.post(
+        "/urls/", params={"original_url": "https://example.com/n"}, headers=auth
+    ).json()
+    table = app_module.URL.__table__
+
+    app_module.write_clicks(
+        [app_module.Click(created["id"], datetime.utcnow(), None, None)] * 3
+    )
+
+    with app_module.engine.connect() as conn:
+        count = conn.scalar(
+            select(table.c.clicks_count).where(table.c.id == created["id"])
+        )
+    assert count == 3
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+
+
+def create_urls(client, auth, replicate, count):
+    aliases = []
+    for index in range(count):
+        response = client.post(
+            "/urls/",
+            params={"original_url": f"https://example.com/export/{index}"},
+            headers=auth,
+        )
+        aliases.append(response.json()["alias"])
+        replicate(aliases[-1])
+    return aliases
+
+
+def test_export_urls_as_ndjson(client, auth, replicate):
+    aliases = create_urls(client, auth, replicate, 3)
+
+    response = client.get("/urls/export", headers=auth)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert 'filename="urls.ndjson"' in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["alias"] for row in rows) == sorted(aliases)
+    assert rows[0]["original_url"].startswith("https://example.com/export/")
+
+
+def test_export_urls_as_csv_with_alias_filter(client, auth, replicate):
+    aliases = create_urls(client, auth, replicate, 2)
+
+    response = client.get(
+        "/urls/export", params={"format": "csv", "alias": aliases[1]}, headers=auth
+    )
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][:3] == ["id", "alias", "original_url"]
+    assert [row[1] for row in rows[1:]] == [aliases[1]]
+
+
+def test_empty_csv_export_has_header_only(client, auth):
+    response = client.get(
+        "/stats/clicks/export", params={"format": "csv"}, headers=auth
+    )
+
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["alias,clicked_at,ip_address,user_agent"]
+
+
+def test_unsupported_format_is_rejected(client, auth):
+    response = client.get("/urls/export", params={"format": "xml"}, headers=auth)
+
+    assert response.status_code == 400
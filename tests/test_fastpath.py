@@ -0,0 +1,42 @@
+import asyncio
+
+from app.fastpath import RedirectFastPath
+
+
+async def fallback(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def get(middleware, path):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+    return messages[0]["status"]
+
+
+def test_reserved_first_segments_skip_resolve_and_reject():
+    resolved, rejected = [], []
+
+    def resolve(alias, scope):
+        resolved.append(alias)
+        return "https://example.com/" if alias == "known" else None
+
+    def reject(alias):
+        rejected.append(alias)
+        return True
+
+    middleware = RedirectFastPath(
+        fallback, resolve, reject=reject, reserved=["docs", "metrics", "stats"]
+    )
+
+    assert get(middleware, "/docs") == 200
+    assert get(middleware, "/stats") == 200
+    assert get(middleware, "/known") == 302
+    assert get(middleware, "/missing") == 404
+    assert resolved == ["known", "missing"]
+    assert rejected == ["missing"]
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.cache import CachedURL
+from app.maintenance import Sweeper
+
+
+def make_sweeper(lock_path, calls):
+    return Sweeper(
+        [
+            ("database", lambda: calls.append("database")),
+            ("memory", lambda: calls.append("memory")),
+        ],
+        lock_path=str(lock_path),
+        local=["memory"],
+    )
+
+
+def test_only_leader_runs_database_jobs(tmp_path):
+    lock_path = tmp_path / "maintenance.lock"
+    leader_calls, follower_calls = [], []
+    leader = make_sweeper(lock_path, leader_calls)
+    follower = make_sweeper(lock_path, follower_calls)
+
+    leader.run_once()
+    follower.run_once()
+
+    assert leader_calls == ["database", "memory"]
+    assert follower_calls == ["memory"]
+    assert leader.stats()["leader"] == 1
+    assert follower.stats()["leader"] == 0
+
+
+def test_follower_takes_over_after_leader_stops(tmp_path):
+    lock_path = tmp_path / "maintenance.lock"
+    leader = make_sweeper(lock_path, [])
+    follower_calls = []
+    follower = make_sweeper(lock_path, follower_calls)
+    leader.run_once()
+    leader.stop()
+
+    follower.run_once()
+
+    assert follower_calls == ["database", "memory"]
+
+
+def test_expire_links_deactivates_and_drops_cached_alias(app_module, client, auth):
+    created = client.post(
+        "/urls/",
+        params={"original_url": "https://example.com/old", "expiration_days": 1},
+        headers=auth,
+    ).json()
+    expires_at = datetime.fromisoformat(created["expires_at"])
+    cached = CachedURL(created["id"], created["original_url"], True, expires_at)
+    app_module.alias_cache.set(created["alias"], cached)
+
+    table = app_module.URL.__table__
+
+    def is_active():
+        with app_module.engine.connect() as conn:
+            return conn.scalar(
+                select(table.c.is_active).where(table.c.id == created["id"])
+            )
+
+    app_module.expire_links(now=expires_at - timedelta(seconds=1))
+    assert is_active()
+    assert app_module.alias_cache.get(created["alias"]) == cached
+
+    assert app_module.expire_links(now=expires_at + timedelta(seconds=1)) >= 1
+    assert not is_active()
+    assert app_module.alias_cache.get(created["alias"]) is None
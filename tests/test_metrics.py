@@ -0,0 +1,66 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.metrics import (
+    CONTENT_TYPE,
+    Histogram,
+    Metrics,
+    MetricsMiddleware,
+    instrument_engine,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency", "Latency", (0.1, 1.0), ("route",))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(("home",), value)
+
+    assert histogram.render()[2:] == [
+        'latency_bucket{route="home",le="0.1"} 1',
+        'latency_bucket{route="home",le="1.0"} 3',
+        'latency_bucket{route="home",le="+Inf"} 4',
+        'latency_sum{route="home"} 4.25',
+        'latency_count{route="home"} 4',
+    ]
+
+
+def test_middleware_counts_responses_and_queries_per_route():
+    metrics = Metrics()
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, metrics)
+    application = FastAPI()
+
+    @application.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    application.add_middleware(MetricsMiddleware, metrics=metrics)
+    client = TestClient(application)
+
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/missing").status_code == 404
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    output = metrics.render()
+    assert 'http_requests_total{route="read_item",status="200"} 1' in output
+    assert 'http_requests_total{route="unmatched",status="404"} 1' in output
+    assert 'http_request_db_queries_bucket{route="read_item",le="3"} 1' in output
+    assert 'http_request_db_queries_bucket{route="read_item",le="2"} 0' in output
+    assert 'db_query_duration_seconds_count{source="request"} 3' in output
+    assert 'db_query_duration_seconds_count{source="background"} 1' in output
+
+
+def test_metrics_endpoint(client, auth):
+    client.get("/urls/", headers=auth)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(CONTENT_TYPE)
+    assert 'http_requests_total{route="list_urls",status="200"}' in response.text
+    assert "# TYPE credentials_cache" in response.text
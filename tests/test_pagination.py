@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bm9waXBl"])
+def test_broken_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_pages_cover_all_urls_once(client, auth):
+    created = set()
+    for index in range(5):
+        response = client.post(
+            "/urls/",
+            params={"original_url": f"https://example.com/page/{index}"},
+            headers=auth,
+        )
+        created.add(response.json()["alias"])
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/urls/", params=params, headers=auth)
+        assert response.status_code == 200
+        seen.extend(item["alias"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert sorted(seen) == sorted(created)
+
+
+def test_invalid_cursor_is_rejected(client, auth):
+    response = client.get("/urls/", params={"cursor": "garbage"}, headers=auth)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.passwords import HasherBusy, PasswordHasher, hash_password, verify_password
+
+N = 1024
+
+
+def test_hash_and_verify():
+    stored = hash_password("secret", n=N)
+
+    assert stored.startswith("scrypt$1024$8$1$")
+    assert verify_password(stored, "secret", n=N) == (True, False)
+    assert verify_password(stored, "wrong", n=N) == (False, False)
+    assert hash_password("secret", n=N) != stored
+
+
+def test_old_parameters_and_plain_text_are_outdated():
+    assert verify_password(hash_password("secret", n=N), "secret", n=2 * N) == (
+        True,
+        True,
+    )
+    assert verify_password("secret", "secret", n=N) == (True, True)
+    assert verify_password("secret", "wrong", n=N) == (False, True)
+
+
+def test_hasher_runs_in_pool():
+    hasher = PasswordHasher(workers=2, n=N)
+
+    async def run():
+        stored = await hasher.hash("secret")
+        return await hasher.verify(stored, "secret"), await hasher.verify(None, "x")
+
+    try:
+        assert asyncio.run(run()) == ((True, False), (False, False))
+        assert hasher.stats()["hashed"] == 1
+        assert hasher.stats()["in_flight"] == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_hasher_rejects_when_pool_and_queue_are_full():
+    hasher = PasswordHasher(workers=1, queue_size=1, n=N)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.create_task(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HasherBusy):
+            await hasher.hash("secret")
+        release.set()
+        await asyncio.gather(*blocked)
+        return await hasher.hash("secret")
+
+    try:
+        assert asyncio.run(run()).startswith("scrypt$")
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+def test_plain_text_password_is_rehashed_on_login(client, app_module):
+    username = f"legacy-{uuid.uuid4().hex[:8]}"
+    with Session(app_module.engine) as session:
+        session.add(app_module.User(username=username, hashed_password="secret"))
+        session.commit()
+    token = base64.b64encode(f"{username}:secret".encode()).decode()
+
+    response = client.get("/urls/", headers={"Authorization": f"Basic {token}"})
+
+    assert response.status_code == 200
+    with Session(app_module.engine) as session:
+        stored = session.scalar(
+            select(app_module.User.hashed_password).where(
+                app_module.User.username == username
+            )
+        )
+    assert stored.startswith("scrypt$")
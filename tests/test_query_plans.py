@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app.query_plans import explain, full_scans, hot_queries
+from app.simple_app import Base
+
+
+@pytest.fixture(scope="module")
+def conn():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        yield connection
+
+
+@pytest.mark.parametrize("name", list(hot_queries()))
+def test_hot_query_uses_an_index(conn, name):
+    plan = explain(conn, hot_queries()[name])
+
+    assert full_scans(plan) == [], plan
+
+
+def test_full_scans_detects_table_scan():
+    assert full_scans(["SCAN urls", "SEARCH users USING INDEX ix (id=?)"]) == [
+        "SCAN urls"
+    ]
@@ -0,0 +1,131 @@
+import base64
+import multiprocessing
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ratelimit import (
+    RateLimiter,
+    RateLimitMiddleware,
+    TokenBuckets,
+    client_key,
+    make_rule,
+    parse_limit,
+)
+
+unix_only = pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl and mmap")
+
+
+def test_token_bucket_allows_burst_then_refills():
+    now = [0.0]
+    buckets = TokenBuckets(clock=lambda: now[0])
+
+    assert [buckets.take("a", rate=1.0, burst=2) for _ in range(2)] == [0.0, 0.0]
+    assert buckets.take("a", rate=1.0, burst=2) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert buckets.take("a", rate=1.0, burst=2) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert buckets.take("a", rate=1.0, burst=2) == 0.0
+
+
+def test_token_buckets_evict_least_recently_used():
+    buckets = TokenBuckets(max_keys=2, clock=lambda: 0.0)
+    buckets.take("a", rate=1.0, burst=1)
+    buckets.take("b", rate=1.0, burst=1)
+    buckets.take("a", rate=1.0, burst=1)
+    buckets.take("c", rate=1.0, burst=1)
+
+    assert buckets.evictions == 1
+    # "a" использован недавно и остался пустым, "b" вытеснен
+    assert buckets.take("a", rate=1.0, burst=1) > 0
+    assert buckets.take("b", rate=1.0, burst=1) == 0.0
+
+
+def _take_many(path, count, results):
+    from app.shared_cache import SharedTokenBuckets
+
+    buckets = SharedTokenBuckets(path, slots=64)
+    allowed = sum(
+        buckets.take("ip:10.0.0.1", rate=1e-9, burst=100) == 0 for _ in range(count)
+    )
+    buckets.close()
+    results.put(allowed)
+
+
+@unix_only
+def test_shared_buckets_count_tokens_across_processes(tmp_path):
+    path = str(tmp_path / "buckets")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_take_many, args=(path, 60, results)) for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    allowed = sum(results.get(timeout=30) for _ in workers)
+    for worker in workers:
+        worker.join()
+
+    assert allowed == 100
+
+
+@unix_only
+def test_shared_buckets_probe_window_stays_inside_file(tmp_path):
+    from app.shared_cache import _PROBES, SharedTokenBuckets
+
+    buckets = SharedTokenBuckets(str(tmp_path / "buckets"), slots=_PROBES)
+    for index in range(_PROBES * 3):
+        buckets.take(f"key-{index}", rate=1.0, burst=1)
+
+    assert buckets.evictions == _PROBES * 2
+    buckets.close()
+
+
+def basic(username, password):
+    token = base64.b64encode(f"{username}:{password}".encode())
+    return [(b"authorization", b"Basic " + token)]
+
+
+def test_parse_limit():
+    assert parse_limit("5:10") == (5.0, 10.0)
+    assert parse_limit("0.5") == (0.5, 1.0)
+    assert parse_limit("0") is None
+    assert parse_limit("") is None
+    with pytest.raises(ValueError):
+        parse_limit("1:0.5")
+
+
+def test_client_key_trusts_only_verified_credentials():
+    scope = {"client": ("10.0.0.1", 1234), "headers": basic("alice", "secret")}
+
+    assert client_key(scope) == "ip:10.0.0.1"
+    assert client_key(scope, verify=lambda *_: False) == "ip:10.0.0.1"
+    assert client_key(scope, verify=lambda *_: True) == "user:alice"
+
+
+def test_middleware_throttles_matching_route_only():
+    application = FastAPI()
+
+    @application.post("/urls/")
+    async def create_url():
+        return {}
+
+    @application.get("/health")
+    async def health():
+        return {}
+
+    rule = make_rule(create_url, "POST", r"^/urls/$", "1:2")
+    limiter = RateLimiter(TokenBuckets(clock=lambda: 0.0))
+    application.add_middleware(RateLimitMiddleware, limiter=limiter, rules=[rule])
+    client = TestClient(application)
+
+    statuses = [client.post("/urls/").status_code for _ in range(3)]
+    throttled = client.post("/urls/")
+
+    assert statuses == [200, 200, 429]
+    assert throttled.headers["retry-after"] == "1"
+    assert throttled.json() == {"detail": "Too many requests"}
+    assert all(client.get("/health").status_code == 200 for _ in range(5))
+    assert limiter.stats()["create_url_throttled"] == 2
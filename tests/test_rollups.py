@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.clicks import Click
+from app.rollups import HOUR, MINUTE, bucket_start, rollup_counts
+
+MOMENT = datetime(2024, 1, 1, 12, 34, 56, 789)
+
+
+def test_bucket_start_truncates_to_minute_and_hour():
+    assert bucket_start(MOMENT, MINUTE) == datetime(2024, 1, 1, 12, 34)
+    assert bucket_start(MOMENT, HOUR) == datetime(2024, 1, 1, 12, 0)
+    with pytest.raises(ValueError):
+        bucket_start(MOMENT, 300)
+
+
+def test_rollup_counts_per_url_and_bucket():
+    clicks = [
+        Click(1, MOMENT, None, None),
+        Click(1, MOMENT + timedelta(seconds=1), None, None),
+        Click(2, MOMENT + timedelta(minutes=1), None, None),
+    ]
+
+    counts = rollup_counts(clicks)
+
+    assert counts[(1, MINUTE, datetime(2024, 1, 1, 12, 34))] == 2
+    assert counts[(2, MINUTE, datetime(2024, 1, 1, 12, 35))] == 1
+    assert counts[(1, HOUR, datetime(2024, 1, 1, 12, 0))] == 2
+    assert counts[(2, HOUR, datetime(2024, 1, 1, 12, 0))] == 1
+
+
+def test_click_windows_count_last_hour_and_day(app_module, client, auth):
+    created = client.post(
+        "/urls/", params={"original_url": "https://example.com/r"}, headers=auth
+    ).json()
+    now = datetime.utcnow()
+    url_id = created["id"]
+    app_module.write_clicks(
+        [
+            Click(url_id, now - timedelta(minutes=10), None, None),
+            Click(url_id, now - timedelta(hours=5), None, None),
+            Click(url_id, now - timedelta(hours=6), None, None),
+            Click(url_id, now - timedelta(days=2), None, None),
+        ]
+    )
+    table = app_module.URL.__table__
+
+    with app_module.engine.connect() as conn:
+        owner_id = conn.scalar(select(table.c.owner_id).where(table.c.id == url_id))
+        windows = conn.execute(app_module.click_windows_query(owner_id, now)).all()
+
+    assert [tuple(row) for row in windows] == [(url_id, 1, 3)]
@@ -0,0 +1,114 @@
+import struct
+from datetime import datetime
+
+import pytest
+
+from app.cache import CachedURL
+
+# Модуль только для Unix (mmap + fcntl)
+pytest.importorskip("fcntl")
+
+from app import shared_cache  # noqa: E402
+from app.shared_cache import SharedAliasCache  # noqa: E402
+
+EXPIRES_AT = datetime(2100, 1, 1)
+
+
+def cached(url="https://example.com/", url_id=1):
+    return CachedURL(url_id, url, True, EXPIRES_AT)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "aliases")
+
+
+@pytest.fixture
+def cache(path):
+    cache = SharedAliasCache(path, slots=64, slot_size=256, ttl=60.0)
+    yield cache
+    cache.close()
+
+
+def test_set_and_get_round_trip(cache):
+    value = cached("https://example.com/путь?q=é", url_id=7)
+
+    assert cache.set("abc", value)
+
+    assert cache.get("abc") == value
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_are_shared_between_instances(cache, path):
+    other = SharedAliasCache(path, slots=64, slot_size=256, ttl=60.0)
+    try:
+        cache.set("abc", cached())
+        assert other.get("abc") == cached()
+
+        other.invalidate("abc")
+        assert cache.get("abc") is None
+    finally:
+        other.close()
+
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shared_cache.time, "time", lambda: now[0])
+    cache.set("abc", cached())
+
+    now[0] += 59
+    assert cache.get("abc") is not None
+    now[0] += 2
+    assert cache.get("abc") is None
+
+
+def test_url_size_is_checked_in_encoded_bytes(cache):
+    # Символов меньше лимита, байтов UTF-8 - больше
+    url = "https://example.com/" + "ж" * (cache.max_url_size // 2)
+    assert len(url) <= cache.max_url_size < len(url.encode())
+
+    assert not cache.set("abc", cached(url))
+    assert cache.get("abc") is None
+    assert not cache.set("x" * 65, cached())
+
+
+def test_full_probe_window_evicts_oldest(path):
+    cache = SharedAliasCache(path, slots=shared_cache._PROBES, slot_size=256)
+    try:
+        for index in range(shared_cache._PROBES + 1):
+            cache.set(f"alias-{index}", cached(url_id=index))
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.get("alias-0") is None
+        assert cache.get(f"alias-{shared_cache._PROBES}") is not None
+    finally:
+        cache.close()
+
+
+def test_torn_slot_is_skipped_and_reused(cache):
+    cache.set("abc", cached())
+    index = cache._find(b"abc")[0]
+    offset = index * cache.slot_size
+    # Писатель упал посреди записи: версия слота осталась нечетной
+    seq = struct.unpack_from("<I", cache._map, offset)[0]
+    struct.pack_into("<I", cache._map, offset, seq + 1)
+
+    assert cache.get("abc") is None
+
+    assert cache.set("abc", cached(url_id=2))
+    assert cache.get("abc") == cached(url_id=2)
+
+
+def test_slot_with_garbage_lengths_is_ignored(cache):
+    cache.set("abc", cached())
+    index = cache._find(b"abc")[0]
+    offset = index * cache.slot_size
+    header = list(shared_cache._HEADER.unpack_from(cache._map, offset))
+    header[7] = cache.max_url_size + 1
+    shared_cache._HEADER.pack_into(cache._map, offset, *header)
+
+    assert cache.get("abc") is None
+    assert cache.set("abc", cached())
+    assert cache.get("abc") == cached()
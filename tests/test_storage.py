@@ -0,0 +1,109 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import QueuePool
+
+from app.database import (
+    async_database_url,
+    dialect_insert,
+    engine,
+    make_engine,
+    pool_options,
+    read_engine,
+)
+
+needs_replica = pytest.mark.skipif(
+    read_engine is engine, reason="replica is not configured"
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("sqlite:///./test.db", "sqlite+aiosqlite:///./test.db"),
+        ("postgresql://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+        ("postgres://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+        ("mysql://u:p@db/app", "mysql://u:p@db/app"),
+    ],
+)
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_pool_options_in_memory_sqlite_keeps_default_pool():
+    assert pool_options("sqlite://") == {}
+    assert pool_options("sqlite:///:memory:") == {}
+
+
+@pytest.mark.parametrize("url", ["sqlite:///./test.db", "postgresql://u:p@db/app"])
+def test_pool_options_use_configured_pool(url):
+    options = pool_options(url)
+    assert options["poolclass"] is QueuePool
+    assert options["pool_size"] > 0
+
+
+def test_make_engine_sqlite_applies_pragmas(tmp_path):
+    bound = make_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    try:
+        with bound.connect() as conn:
+            mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    finally:
+        bound.dispose()
+    assert mode == "wal"
+
+
+def test_dialect_insert_matches_primary(app_module):
+    statement = dialect_insert(app_module.URL.__table__).on_conflict_do_nothing()
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    compiled = str(statement.compile(dialect=dialect.dialect()))
+    assert "ON CONFLICT DO NOTHING" in compiled
+
+
+def test_create_writes_to_primary(app_module, client, auth):
+    response = client.post(
+        "/urls/", params={"original_url": "https://example.com/w"}, headers=auth
+    )
+    assert response.status_code == 201
+    alias = response.json()["alias"]
+    table = app_module.URL.__table__
+    with engine.connect() as conn:
+        assert conn.scalar(select(table.c.id).where(table.c.alias == alias))
+    if read_engine is not engine:
+        with read_engine.connect() as conn:
+            assert conn.scalar(select(table.c.id).where(table.c.alias == alias)) is None
+
+
+@needs_replica
+def test_redirect_reads_from_replica(app_module, client):
+    # Строка есть только в "реплике": редирект мог найти ее только там
+    alias = f"r{uuid.uuid4().hex[:8]}"
+    with read_engine.begin() as conn:
+        conn.execute(
+            insert(app_module.URL.__table__),
+            {
+                "original_url": "https://example.com/replica",
+                "alias": alias,
+                "is_active": True,
+                "created_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(days=1),
+                "clicks_count": 0,
+            },
+        )
+    response = client.get(f"/{alias}", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/replica"
+
+
+@needs_replica
+def test_detailed_stats_read_from_replica(client, auth):
+    response = client.post(
+        "/urls/", params={"original_url": "https://example.com/s"}, headers=auth
+    )
+    assert response.status_code == 201
+    # Ссылка записана в основную базу, в "реплику" она еще не попала
+    stats = client.get("/stats/detailed/", headers=auth)
+    assert stats.status_code == 200
+    assert stats.json() == []
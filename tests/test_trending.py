@@ -0,0 +1,89 @@
+import sys
+
+import pytest
+
+from app.trending import SpaceSaving, TrendingAliases
+
+unix_only = pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl")
+
+
+def test_space_saving_keeps_heavy_hitters_within_capacity():
+    sketch = SpaceSaving(capacity=3)
+    for key in ["a"] * 10 + ["b"] * 5 + list("cdefg"):
+        sketch.add(key)
+
+    assert len(sketch.counts) == 3
+    assert sketch.counts["a"] == [10, 0]
+    assert sketch.counts["b"] == [5, 0]
+    assert sketch.total == 20
+
+
+def test_space_saving_newcomer_inherits_evicted_count_as_error():
+    sketch = SpaceSaving(capacity=2)
+    for key in "aabc":
+        sketch.add(key)
+
+    assert "b" not in sketch.counts
+    assert sketch.counts["c"] == [2, 1]
+
+
+def test_windows_drop_buckets_that_slid_out():
+    now = [0.0]
+    trending = TrendingAliases(capacity=10, clock=lambda: now[0])
+    for _ in range(3):
+        trending.add("old")
+    now[0] = 400.0
+    trending.add("new")
+
+    assert trending.top("5m") == [("new", 1, 0)]
+    assert trending.top("1h") == [("old", 3, 0), ("new", 1, 0)]
+
+
+def test_top_adds_other_processes_entries():
+    trending = TrendingAliases(capacity=10, clock=lambda: 0.0)
+    trending.add("a")
+
+    top = trending.top("5m", extra=[[["a", 2, 1], ["b", 5, 0]]])
+
+    assert top == [("b", 5, 0), ("a", 3, 1)]
+
+
+@unix_only
+def test_exchange_merges_published_tops_of_other_workers(tmp_path):
+    from app.shared_cache import TrendingExchange
+
+    mine = TrendingAliases(capacity=10)
+    theirs = TrendingAliases(capacity=10)
+    mine.add("a")
+    for _ in range(4):
+        theirs.add("b")
+    directory = str(tmp_path)
+    tmp_path.joinpath("stale.json").write_text("{}")
+    local = TrendingExchange(directory, mine, stale_after=60)
+    other = TrendingExchange(directory, theirs)
+    other.path = str(tmp_path / "other.json")
+    other.publish()
+
+    assert local.top("5m") == [("b", 4, 0), ("a", 1, 0)]
+
+
+def test_endpoint_lists_only_callers_links(app_module, client, auth, replicate):
+    mine = client.post(
+        "/urls/", params={"original_url": "https://example.com/mine"}, headers=auth
+    ).json()["alias"]
+    username = "trending-other"
+    client.post("/register/", params={"username": username, "password": "secret"})
+    theirs = client.post(
+        "/urls/",
+        params={"original_url": "https://example.com/theirs"},
+        auth=(username, "secret"),
+    ).json()["alias"]
+    for alias in (mine, theirs):
+        replicate(alias)
+    for alias in (mine, theirs, theirs):
+        assert client.get(f"/{alias}", follow_redirects=False).status_code == 302
+
+    response = client.get("/stats/trending", params={"window": "5m"}, headers=auth)
+
+    assert response.status_code == 200
+    assert [item["alias"] for item in response.json()["5m"]] == [mine]